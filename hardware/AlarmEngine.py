@@ -0,0 +1,82 @@
+import time
+
+# Signed levels: negative = below the band, positive = above it
+NORMAL = 0
+WARN = 1
+CRIT = 2
+LEVEL_NAMES = ('normal', 'warning', 'critical')  # same names as the server-side rules
+
+
+class Alarm_Rule:
+    def __init__(self, crit_lo=None, warn_lo=None, warn_hi=None, crit_hi=None, hyst=0):
+        self.crit_lo = crit_lo
+        self.warn_lo = warn_lo
+        self.warn_hi = warn_hi
+        self.crit_hi = crit_hi
+        self.hyst = hyst
+
+    def classify(self, value, current):
+        # A level that is already active only clears once the value is `hyst` back inside
+        h = self.hyst
+        if self.crit_hi is not None and value > self.crit_hi - (h if current >= CRIT else 0):
+            return CRIT
+        if self.crit_lo is not None and value < self.crit_lo + (h if current <= -CRIT else 0):
+            return -CRIT
+        if self.warn_hi is not None and value > self.warn_hi - (h if current >= WARN else 0):
+            return WARN
+        if self.warn_lo is not None and value < self.warn_lo + (h if current <= -WARN else 0):
+            return -WARN
+        return NORMAL
+
+
+class Alarm_Engine:
+    def __init__(self, min_duration_ms=0):
+        self.min_duration_ms = min_duration_ms
+        self.rules = {}
+        # (key, metric) -> [level, candidate level, ticks the candidate was first seen]
+        self.states = {}
+
+    def set_rule(self, metric, rule):
+        # rule None removes the metric along with its current levels
+        if rule is None:
+            self.rules.pop(metric, None)
+            for key in [k for k in self.states if k[1] == metric]:
+                del self.states[key]
+            return
+        self.rules[metric] = rule
+
+    def level(self, key, metric):
+        state = self.states.get((key, metric))
+        return state[0] if state else NORMAL
+
+    def check(self, key, metric, value, now):
+        # Returns (previous, new) when the debounced level changes, else None
+        rule = self.rules.get(metric)
+        if rule is None or value is None:
+            return None
+        state = self.states.get((key, metric))
+        if state is None:
+            state = self.states[(key, metric)] = [NORMAL, NORMAL, now]
+        raw = rule.classify(value, state[0])
+        if raw == state[0]:
+            state[1] = raw
+            return None
+        if raw != state[1]:
+            state[1] = raw
+            state[2] = now
+        if time.ticks_diff(now, state[2]) < self.min_duration_ms:
+            return None
+        prev = state[0]
+        state[0] = raw
+        return prev, raw
+
+    def evaluate(self, values):
+        # values: iterable of (key, metric, value). Returns the transitions as
+        # (key, metric, previous level, new level, value).
+        now = time.ticks_ms()
+        transitions = []
+        for key, metric, value in values:
+            change = self.check(key, metric, value, now)
+            if change:
+                transitions.append((key, metric, change[0], change[1], value))
+        return transitions
@@ -0,0 +1,148 @@
+import struct
+import gc
+from TelemetryCodec import VALUE_KEYS, OVERALL_PIN, to_fixed, from_fixed, to_count
+
+MAGIC = b'DHTB'
+VERSION = 1
+HEADER_FMT = '<4sHHIIIB'  # magic, version, record size, capacity, read seq, write seq, boot
+HEADER_SIZE = 32
+# seq, time anchor, pin, flags, VALUE_KEYS as int16 hundredths, rows the deadband held back before it
+RECORD_FMT = '<IIBB8hH'
+RECORD_SIZE = struct.calcsize(RECORD_FMT)
+ANCHOR_EPOCH = 0x01  # flags: anchor is Unix seconds; otherwise ticks_ms from before the first time sync
+BOOT_SHIFT = 1  # flags bits 1-7: boot count when the record was written (ticks_ms restart every boot)
+BOOT_MASK = 0x7F
+
+
+class Backup_Store:
+    def __init__(self, filename='dht22_backup.bin', capacity=16384):
+        self.filename = filename
+        self.capacity = max(int(capacity), 1)
+        self.read_seq = 0
+        self.write_seq = 0
+        self.overwritten = 0
+        self.boot = 0
+        self._rec = bytearray(RECORD_SIZE)
+        self._hdr = bytearray(HEADER_SIZE)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.filename, 'rb') as f:
+                f.readinto(self._hdr)
+            magic, version, rec_size, capacity, read_seq, write_seq, boot = struct.unpack_from(HEADER_FMT, self._hdr)
+            if (magic == MAGIC and version == VERSION and rec_size == RECORD_SIZE
+                    and capacity == self.capacity and 0 <= write_seq - read_seq <= capacity):
+                self.read_seq = read_seq
+                self.write_seq = write_seq
+                # Saved with the next header write, so every boot that wrote records has its own number
+                self.boot = (boot + 1) & BOOT_MASK
+                print(f"[INFO]: Backup store {self.pending()} records pending")
+                return
+            print("[WARNING]: Backup store layout changed; recreating")
+        except Exception:
+            pass
+        self._create()
+
+    def _create(self):
+        # Preallocate the whole ring so appends never grow the file
+        self.read_seq = self.write_seq = 0
+        try:
+            with open(self.filename, 'wb') as f:
+                self._pack_header()
+                f.write(self._hdr)
+                chunk = bytearray(RECORD_SIZE * 32)
+                left = self.capacity
+                while left:
+                    n = min(left, 32)
+                    f.write(memoryview(chunk)[:n * RECORD_SIZE])
+                    left -= n
+            print(f"[SUCCESS]: Backup store created ({self.capacity} records)")
+        except Exception as e:
+            print(f"[ERROR]: Backup store create failed: {e}")
+        gc.collect()
+
+    def _pack_header(self):
+        struct.pack_into(HEADER_FMT, self._hdr, 0, MAGIC, VERSION, RECORD_SIZE,
+                         self.capacity, self.read_seq, self.write_seq, self.boot)
+
+    def _write_header(self, f):
+        self._pack_header()
+        f.seek(0)
+        f.write(self._hdr)
+
+    def pending(self):
+        return self.write_seq - self.read_seq
+
+    def placeable(self, flags):
+        # A ticks_ms anchor only means something in the boot that took it
+        return bool(flags & ANCHOR_EPOCH) or (flags >> BOOT_SHIFT) & BOOT_MASK == self.boot
+
+    def append(self, records, flags=0):
+        # records: iterable of (anchor, row dict). Oldest records are overwritten when full.
+        count = 0
+        flags |= self.boot << BOOT_SHIFT
+        try:
+            with open(self.filename, 'r+b') as f:
+                rec = self._rec
+                for anchor, row in records:
+                    pin = row.get('pin')
+                    struct.pack_into(
+                        RECORD_FMT, rec, 0,
+                        self.write_seq & 0xFFFFFFFF, anchor & 0xFFFFFFFF,
+                        OVERALL_PIN if pin == 'OVERALL' else pin, flags,
+                        *[to_fixed(row.get(k)) for k in VALUE_KEYS], to_count(row.get('suppressed'))
+                    )
+                    f.seek(HEADER_SIZE + (self.write_seq % self.capacity) * RECORD_SIZE)
+                    f.write(rec)
+                    self.write_seq += 1
+                    count += 1
+                    if self.write_seq - self.read_seq > self.capacity:
+                        self.read_seq = self.write_seq - self.capacity
+                        self.overwritten += 1
+                self._write_header(f)
+        except Exception as e:
+            print(f"[ERROR]: Backup append failed: {e}")
+        return count
+
+    def read(self, max_records):
+        # Oldest-first records starting at the read cursor; the cursor is not moved
+        out = []
+        n = min(max_records, self.pending())
+        if n <= 0:
+            return out
+        try:
+            with open(self.filename, 'rb') as f:
+                rec = self._rec
+                for i in range(n):
+                    f.seek(HEADER_SIZE + ((self.read_seq + i) % self.capacity) * RECORD_SIZE)
+                    f.readinto(rec)
+                    fields = struct.unpack_from(RECORD_FMT, rec)
+                    seq = (self.read_seq + i) & 0xFFFFFFFF
+                    row = None
+                    if fields[0] == seq:  # a torn or stale slot is handed back as None
+                        row = self._row(fields)
+                    out.append((seq, fields[1], fields[3], row))
+        except Exception as e:
+            print(f"[ERROR]: Backup read failed: {e}")
+        return out
+
+    @staticmethod
+    def _row(fields):
+        row = {'pin': 'OVERALL' if fields[2] == OVERALL_PIN else fields[2]}
+        for k, v in zip(VALUE_KEYS, fields[4:12]):
+            row[k] = from_fixed(v)
+        if fields[12]:
+            row['suppressed'] = fields[12]
+        return row
+
+    def advance_to(self, seq):
+        # Move the read cursor up to `seq`; appends may already have pushed it further
+        if seq <= self.read_seq:
+            return
+        self.read_seq = min(seq, self.write_seq)
+        try:
+            with open(self.filename, 'r+b') as f:
+                self._write_header(f)
+        except Exception as e:
+            print(f"[ERROR]: Backup cursor update failed: {e}")
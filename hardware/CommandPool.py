@@ -0,0 +1,67 @@
+import uasyncio as asyncio
+
+
+class Command_Pool:
+    # Bounded queue of inbound messages served by a few worker tasks, so one slow command
+    # (flash reads, a settle delay) doesn't hold up the rest. A message that finds the queue
+    # full, or whose handler runs past its timeout, is answered through reject_fn instead of
+    # being dropped silently.
+    def __init__(self, run_fn, reject_fn, workers=2, depth=4):
+        # run_fn(topic, msg): coroutine handling one message; raises asyncio.TimeoutError on expiry
+        # reject_fn(topic, msg, reason): coroutine sending the "busy" response
+        self.run_fn = run_fn
+        self.reject_fn = reject_fn
+        self.workers = max(int(workers), 1)
+        self.slots = [None] * max(int(depth), 1)
+        self.head = 0
+        self.count = 0
+        self.ready = asyncio.Event()
+        self.active = 0
+        self.stats = dict(done=0, failed=0, busy=0, timeouts=0, peak=0)
+
+    def start(self):
+        for _ in range(self.workers):
+            asyncio.create_task(self._worker())
+
+    async def submit(self, topic, msg):
+        # Never waits on a handler; returns False if the message was turned away
+        if self.count >= len(self.slots):
+            self.stats['busy'] += 1
+            print(f"[WARNING]: Command queue full, rejecting message on '{topic}'")
+            await self.reject_fn(topic, msg, "queue full")
+            return False
+        self.slots[(self.head + self.count) % len(self.slots)] = (topic, msg)
+        self.count += 1
+        if self.count > self.stats['peak']:
+            self.stats['peak'] = self.count
+        self.ready.set()
+        return True
+
+    async def _worker(self):
+        while True:
+            if not self.count:
+                self.ready.clear()
+                await self.ready.wait()
+                continue
+            topic, msg = self.slots[self.head]
+            self.slots[self.head] = None
+            self.head = (self.head + 1) % len(self.slots)
+            self.count -= 1
+            self.active += 1
+            try:
+                await self.run_fn(topic, msg)
+                self.stats['done'] += 1
+            except asyncio.TimeoutError:
+                self.stats['timeouts'] += 1
+                print(f"[WARNING]: Command on '{topic}' timed out")
+                try:
+                    await self.reject_fn(topic, msg, "timeout")
+                except Exception as e:
+                    print(f"[ERROR]: Busy response failed: {e}")
+            except Exception as e:
+                self.stats['failed'] += 1
+                print(f"[ERROR]: Processing message failed: {e}")
+            self.active -= 1
+
+    def pending(self):
+        return self.count
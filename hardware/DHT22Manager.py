@@ -1,14 +1,44 @@
 import time
-import ujson
 import uos
 import ubinascii
-import machine
 import uasyncio as asyncio
-import dht
 import gc
 from machine import Pin
-from TimeManager import Time_Manager
 from ConfigManager import Config_Manager
+from SensorPool import Sensor_Pool
+from SensorStats import Running_Stats, summarize
+from BackupStore import Backup_Store, ANCHOR_EPOCH
+from TelemetryCodec import encode_into, encoded_size
+from SensorHistory import Sensor_History
+from SensorRollup import Sensor_Rollup
+from SensorFilter import Sample_Filter, MODES as FILTER_MODES, TEMP as F_TEMP, HUM as F_HUM
+from SensorSampler import Sensor_Sampler, Cycle_Clock, DHT22_MIN_PERIOD_MS
+from SensorThread import Sampling_Thread
+from AlarmEngine import Alarm_Engine, Alarm_Rule, NORMAL, CRIT, LEVEL_NAMES
+from PublishQueue import ALARM, TELEMETRY, BACKLOG
+
+
+# Used in arithmetic by __init__ and apply_config, so a value of the wrong type would stop the service
+NUMBER_KEYS = ('TEMP_MIN', 'TEMP_MAX', 'HUM_MIN', 'HUM_MAX', 'CON_TEMP_MIN', 'CON_TEMP_MAX', 'CON_HUM_MIN',
+               'CON_HUM_MAX', 'Calibrate_temp', 'Calibrate_hum', 'READ_DELAY', 'DHT22_INTERVAL', 'CYCLE_PERIOD',
+               'HEARTBEAT_INTERVAL', 'ALARM_MIN_DURATION', 'BACKLOG_DRAIN_RATE', 'DEADBAND_TEMP', 'DEADBAND_HUM',
+               'PER_TEMP_ALARM', 'PER_HUM_ALARM', 'ALARM_HYST_TEMP', 'ALARM_HYST_HUM', 'FILTER_MAD_K',
+               'FILTER_MIN_DEV_TEMP', 'FILTER_MIN_DEV_HUM', 'FILTER_EMA_ALPHA', 'SENSOR_BACKOFF', 'SENSOR_MAX_BACKOFF')
+WARN_KEYS = ('CON_TEMP_WARN_LOW', 'CON_TEMP_WARN_HIGH', 'CON_HUM_WARN_LOW', 'CON_HUM_WARN_HIGH')
+# Durations, rates and widths, which can't go below zero
+NON_NEGATIVE_KEYS = ('DHT22_INTERVAL', 'CYCLE_PERIOD', 'HEARTBEAT_INTERVAL', 'ALARM_MIN_DURATION', 'BACKLOG_DRAIN_RATE',
+                     'DEADBAND_TEMP', 'DEADBAND_HUM', 'FILTER_MAD_K', 'FILTER_MIN_DEV_TEMP', 'FILTER_MIN_DEV_HUM',
+                     'SENSOR_BACKOFF', 'SENSOR_MAX_BACKOFF')
+# Sizes, counts and pin numbers, with their minimum
+INT_KEYS = (('SAMPLE_COUNT', 1), ('LED_PIN', 0), ('BACKUP_CAPACITY', 1), ('HISTORY_MINUTES', 1),
+            ('FILTER_WINDOW', 1), ('SENSOR_FAIL_THRESHOLD', 1), ('BACKLOG_BATCH', 1))
+CHOICE_KEYS = (('SAMPLING_MODE', ('async', 'thread')), ('FILTER_MODE', FILTER_MODES), ('PAYLOAD_FORMAT', ('rows', 'batch')),
+               ('PAYLOAD_ENCODING', ('json', 'binary')), ('PUBLISH_MODE', ('all', 'deadband')), ('BACKLOG_QOS', (0, 1)))
+
+# Read only at start-up (buffers, pins, drivers and tasks are built from them)
+RESTART_KEYS = ('DHT22_PINS', 'LED_PIN', 'BACKUP_CAPACITY', 'HISTORY_MINUTES', 'ROLLUP_TIERS', 'SAMPLING_MODE',
+                'FILTER_MODE', 'FILTER_WINDOW', 'FILTER_MAD_K', 'FILTER_MIN_DEV_TEMP', 'FILTER_MIN_DEV_HUM',
+                'FILTER_EMA_ALPHA', 'SENSOR_FAIL_THRESHOLD', 'SENSOR_BACKOFF', 'SENSOR_MAX_BACKOFF')
 
 
 class DHT22_Manager:
@@ -18,10 +48,63 @@ class DHT22_Manager:
         config = self.config_manager.load_config()
 
         self.dht22_pins = config.get('DHT22_PINS', [25, 26, 32, 33])
+        self.led = Pin(config.get('LED_PIN', 13), Pin.OUT)
+        self.time_manager = time_manager
+        self.mqtt_manager = mqtt_manager
+        self.ethernet = ethernet
+        self.backup_store = Backup_Store('dht22_backup.bin', capacity=config.get('BACKUP_CAPACITY', 16384))
+        self.drop_backup_csv('dht22_backup.csv')
+        self.bin_buf = bytearray(encoded_size(len(self.dht22_pins) + 1))
+        self.deadband_state = {}
+        self.mac = ethernet.get_mac()
+        self.mac_bytes = ubinascii.unhexlify(self.mac.replace(':', ''))
+        self.dht22_topic = f"esp32/{self.mac}/dht"
+        # CYCLE_PERIOD > 0: cycles start on wall-clock multiples of it; 0 = sleep DHT22_INTERVAL between cycles
+        self.cycle_period_ms = 0
+        self.cycle_clock = None
+        self.cycle_stats = {}
+        # SAMPLING_MODE "thread" moves the reads onto a second thread (see SensorThread)
+        self.sampling_mode = config.get('SAMPLING_MODE', 'async')
+        self.sampling_thread = None
+        self.led_manager = led_manager
+        self.last_overall = {"Temperature": None, "Humidity": None}
+        self.update_event = asyncio.Event()
+        self.pin_stats = {pin: Running_Stats() for pin in self.dht22_pins}
+        self.window_ticks = (None, None)  # ticks_ms of the first and last good sample of the last cycle
+        self.pin_filters = {
+            pin: Sample_Filter(
+                config.get('FILTER_MODE', 'none'),
+                window=config.get('FILTER_WINDOW', 5),
+                mad_k=config.get('FILTER_MAD_K', 3.5),
+                min_dev=(config.get('FILTER_MIN_DEV_TEMP', 0.5), config.get('FILTER_MIN_DEV_HUM', 2.0)),
+                alpha=config.get('FILTER_EMA_ALPHA', 0.3)
+            ) for pin in self.dht22_pins
+        }
+        self.history = Sensor_History(self.dht22_pins, minutes=config.get('HISTORY_MINUTES', 360))
+        self.rollup = Sensor_Rollup(self.dht22_pins, periods=config.get('ROLLUP_TIERS', [60, 900, 3600]),
+                                    timezone_offset=time_manager.timezone_offset)
+        self.rollup_topic = f"esp32/{self.mac}/rollup"
+        self.alert_topic = f"esp32/{self.mac}/alert"
+        self.pending_alerts = []
+        self.alarm_engine = Alarm_Engine()
+        self.sensor_pool = Sensor_Pool(
+            self.dht22_pins,
+            fail_threshold=config.get('SENSOR_FAIL_THRESHOLD', 3),
+            backoff_ms=config.get('SENSOR_BACKOFF', 10) * 1000,
+            max_backoff_ms=config.get('SENSOR_MAX_BACKOFF', 600) * 1000
+        )
+        self.sampler = Sensor_Sampler(self.sensor_pool, self.pin_filters)
+        self.apply_config(config)
+        gc.collect()
+
+    def apply_config(self, config=None):
+        # Everything that can change while running; __init__ goes through here too.
+        # Keys in RESTART_KEYS size buffers or pick drivers and only take effect after a reset.
+        if config is None:
+            config = self.config_manager.load_config()
         self.sensor_locations = {
             int(k): v for k, v in config.get('SENSOR_LOCATIONS', {str(p): f"Sensor{p}" for p in self.dht22_pins}).items()
         }
-        self.led = Pin(config.get('LED_PIN', 13), Pin.OUT)
         self.sample_count = config.get('SAMPLE_COUNT', 7)
         self.read_delay = config.get('READ_DELAY', 2)
         self.min_temp_condition = config.get('CON_TEMP_MIN', 18) + config.get('Calibrate_temp', 0.5)
@@ -34,134 +117,122 @@ class DHT22_Manager:
         self.max_hum_spec = config.get('HUM_MAX', 100)
         self.per_temp_alarm = config.get('PER_TEMP_ALARM', 5)
         self.per_hum_alarm = config.get('PER_HUM_ALARM', 5)
-        self.time_manager = time_manager
-        self.mqtt_manager = mqtt_manager
-        self.ethernet = ethernet
-        self.backup_csv = 'dht22_backup.csv'
-        self.mac = ethernet.get_mac()
-        self.dht22_topic = f"esp32/{self.mac}/dht"
+        self.drain_rate = config.get('BACKLOG_DRAIN_RATE', 5)
+        self.payload_format = config.get('PAYLOAD_FORMAT', 'rows')
+        self.payload_encoding = config.get('PAYLOAD_ENCODING', 'json')
+        self.publish_mode = config.get('PUBLISH_MODE', 'all')
+        self.deadband_temp = config.get('DEADBAND_TEMP', 0.2)
+        self.deadband_hum = config.get('DEADBAND_HUM', 1.0)
+        self.heartbeat_ms = config.get('HEARTBEAT_INTERVAL', 600) * 1000
+        self.drain_batch = config.get('BACKLOG_BATCH', 20)
+        # QoS1 lets the drain keep a window of batches in flight and only advance past acked ones
+        self.drain_qos = config.get('BACKLOG_QOS', 1)
         self.dht22_interval = config.get('DHT22_INTERVAL', 2)
-        self.led_manager = led_manager
-        self.last_overall = {"Temperature": None, "Humidity": None}
-        self.update_event = asyncio.Event()
+
+        period_ms = int(config.get('CYCLE_PERIOD', 0) * 1000)
+        if period_ms != self.cycle_period_ms:
+            self.cycle_period_ms = period_ms
+            if not period_ms:
+                self.cycle_clock = None
+            elif self.cycle_clock:
+                self.cycle_clock.set_period(period_ms)
+            else:
+                self.cycle_clock = Cycle_Clock(period_ms, self.time_manager.ms_to_boundary)
+            self.cycle_stats = self.cycle_clock.stats if self.cycle_clock else {}
+        if self.sampling_thread:
+            self.sampling_thread.clock = self.cycle_clock
+            self.sampling_thread.interval = self.dht22_interval
+
+        sampler = self.sampler
+        sampler.sample_count = self.sample_count
+        sampler.read_delay = self.read_delay
+        sampler.min_temp_spec, sampler.max_temp_spec = self.min_temp_spec, self.max_temp_spec
+        sampler.min_hum_spec, sampler.max_hum_spec = self.min_hum_spec, self.max_hum_spec
+
+        engine = self.alarm_engine
+        engine.min_duration_ms = config.get('ALARM_MIN_DURATION', 0) * 1000
+        # Critical = the CON_* limits (as already used for the LED), warning = CON_*_WARN_*
+        engine.set_rule('temp', Alarm_Rule(
+            self.min_temp_condition, config.get('CON_TEMP_WARN_LOW'), config.get('CON_TEMP_WARN_HIGH'),
+            self.max_temp_condition, hyst=config.get('ALARM_HYST_TEMP', 0.3)))
+        engine.set_rule('hum', Alarm_Rule(
+            self.min_hum_condition, config.get('CON_HUM_WARN_LOW'), config.get('CON_HUM_WARN_HIGH'),
+            self.max_hum_condition, hyst=config.get('ALARM_HYST_HUM', 1.0)))
+        # PER_*_ALARM: how far one pin may drift from the overall average before it warns (0 = off)
+        engine.set_rule('temp_dev', Alarm_Rule(
+            warn_lo=-self.per_temp_alarm, warn_hi=self.per_temp_alarm,
+            hyst=config.get('ALARM_HYST_TEMP', 0.3)) if self.per_temp_alarm else None)
+        engine.set_rule('hum_dev', Alarm_Rule(
+            warn_lo=-self.per_hum_alarm, warn_hi=self.per_hum_alarm,
+            hyst=config.get('ALARM_HYST_HUM', 1.0)) if self.per_hum_alarm else None)
         gc.collect()
 
+    def config_error(self, config):
+        # Why config can't be run, or None. set_config checks a new config with this
+        # before saving it, so a bad one never reaches apply_config.
+        for key in NUMBER_KEYS + WARN_KEYS:
+            value = config.get(key)
+            if value is None and (key in WARN_KEYS or key not in config):
+                continue  # Unset: no warn level / the built-in default
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return f"{key} must be a number"
+        for key in NON_NEGATIVE_KEYS:
+            if config.get(key, 0) < 0:
+                return f"{key} must not be negative"
+        for key, low in INT_KEYS:
+            value = config.get(key, low)
+            if isinstance(value, bool) or not isinstance(value, int) or value < low:
+                return f"{key} must be an integer >= {low}"
+        for key, choices in CHOICE_KEYS:
+            value = config.get(key, choices[0])
+            if isinstance(value, bool) or value not in choices:
+                return f"{key} must be one of {choices}"
+        if not 0 < config.get('FILTER_EMA_ALPHA', 0.3) <= 1:
+            return "FILTER_EMA_ALPHA must be in (0, 1]"
+        tiers = config.get('ROLLUP_TIERS', [60])
+        if not isinstance(tiers, list) or any((isinstance(p, bool) or not isinstance(p, int) or p < 1) for p in tiers):
+            return "ROLLUP_TIERS must be a list of seconds"
+        pins = config.get('DHT22_PINS', [25, 26, 32, 33])
+        if not (isinstance(pins, (list, tuple)) and pins):
+            return "No pins defined"
+        if any((not isinstance(p, int) or p < 0) for p in pins):
+            return "Pins must be positive int"
+        locations = config.get('SENSOR_LOCATIONS', {})
+        if not isinstance(locations, dict) or any((not isinstance(k, str) or not k.isdigit()) for k in locations):
+            return "SENSOR_LOCATIONS must map pin numbers to names"
+        if config.get('READ_DELAY', 2) < 2:
+            return "Read delay < 2s"
+        if (config.get('TEMP_MIN', -40) >= config.get('TEMP_MAX', 100)
+                or config.get('HUM_MIN', 0) >= config.get('HUM_MAX', 100)):
+            return "Specification min >= max"
+        cal_temp = config.get('Calibrate_temp', 0.5)
+        cal_hum = config.get('Calibrate_hum', 2)
+        if (config.get('CON_TEMP_MIN', 18) + cal_temp >= config.get('CON_TEMP_MAX', 27) - cal_temp
+                or config.get('CON_HUM_MIN', 40) + cal_hum >= config.get('CON_HUM_MAX', 65) - cal_hum):
+            return "Condition min >= max"
+        return None
+
     def check_config(self):
-        if not (isinstance(self.dht22_pins, (list, tuple)) and self.dht22_pins):
-            print("[ERROR]: No pins defined")
-            return False
-        if any((not isinstance(p, int) or p < 0) for p in self.dht22_pins):
-            print("[ERROR]: Pins must be positive int")
-            return False
-        if not (isinstance(self.sample_count, int) and self.sample_count > 0):
-            print("[ERROR]: Sample count invalid")
-            return False
-        if self.read_delay < 2:
-            print("[ERROR]: Read delay < 2s")
-            return False
-        if self.min_temp_spec >= self.max_temp_spec or self.min_hum_spec >= self.max_hum_spec:
-            print("[ERROR]: Specification min >= max")
-            return False
-        if self.min_temp_condition >= self.max_temp_condition or self.min_hum_condition >= self.max_hum_condition:
-            print("[ERROR]: Condition min >= max")
+        error = self.config_error(self.config_manager.load_config())
+        if error:
+            print(f"[ERROR]: {error}")
             return False
+        if self.cycle_period_ms and self.cycle_period_ms < self.sample_count * max(int(self.read_delay * 1000), DHT22_MIN_PERIOD_MS):
+            print("[WARNING]: Cycle period shorter than the sampling window; cycles will overrun")
         return True
 
-    async def setup_pins(self):
-        sensor_pin = {}
-        for pin_num in self.dht22_pins:
-            try:
-                gpio = Pin(pin_num, mode=Pin.OPEN_DRAIN, pull=Pin.PULL_UP)
-                sensor = dht.DHT22(gpio)
-                await asyncio.sleep(0.7)
-                sensor.measure()
-                sensor_pin[pin_num] = sensor
-                print(f"[SUCCESS]: Pin {pin_num} ready")
-            except Exception as e:
-                print(f"[ERROR]: Pin {pin_num} init failed: {e}")
-        gc.collect()
-        return sensor_pin if sensor_pin else None
-
-    async def read_sensor(self, sensor):
-        try:
-            sensor.measure()
-            await asyncio.sleep(0.25)
-            temp = sensor.temperature()
-            hum = sensor.humidity()
-            if not (self.min_temp_spec <= temp <= self.max_temp_spec):
-                temp = None
-            if not (self.min_hum_spec <= hum <= self.max_hum_spec):
-                hum = None
-            return temp, hum
-        except Exception:
-            return None, None
-
     async def collect_data(self, sensor_pin):
-        collected_data = {
-            pin: dict(
-                temp_sum=0, hum_sum=0,
-                samples_temp=0, samples_hum=0,
-                temp_max=None, temp_min=None,
-                hum_max=None, hum_min=None
-            )
-            for pin in sensor_pin
-        }
-        for _ in range(self.sample_count):
-            for pin, sensor_obj in sensor_pin.items():
-                temp, hum = await self.read_sensor(sensor_obj)
-                collect = collected_data[pin]
-                if temp is not None:
-                    collect['temp_sum'] += temp
-                    collect['samples_temp'] += 1
-                    collect['temp_max'] = temp if collect['temp_max'] is None else max(collect['temp_max'], temp)
-                    collect['temp_min'] = temp if collect['temp_min'] is None else min(collect['temp_min'], temp)
-                if hum is not None:
-                    collect['hum_sum'] += hum
-                    collect['samples_hum'] += 1
-                    collect['hum_max'] = hum if collect['hum_max'] is None else max(collect['hum_max'], hum)
-                    collect['hum_min'] = hum if collect['hum_min'] is None else min(collect['hum_min'], hum)
-            await asyncio.sleep(self.read_delay)
-        gc.collect()
-        return collected_data
-
-    def calculate_average(self, collected_data):
-        per_sensor_data = {}
-        total_temp = total_hum = count_temp = count_hum = 0
-        for pin, data in collected_data.items():
-            avg_temp = round(data['temp_sum'] / data['samples_temp'], 1) if data['samples_temp'] else None
-            avg_hum = round(data['hum_sum'] / data['samples_hum'], 1) if data['samples_hum'] else None
-            per_sensor_data[pin] = dict(
-                temp=avg_temp, hum=avg_hum,
-                temp_max=data['temp_max'], temp_min=data['temp_min'],
-                hum_max=data['hum_max'], hum_min=data['hum_min']
-            )
-            if avg_temp is not None:
-                total_temp += avg_temp * data['samples_temp']
-                count_temp += data['samples_temp']
-            if avg_hum is not None:
-                total_hum += avg_hum * data['samples_hum']
-                count_hum += data['samples_hum']
-        overall = dict(
-            Temperature=round(total_temp / count_temp, 1) if count_temp else None,
-            Humidity=round(total_hum / count_hum, 1) if count_hum else None
-        )
-        gc.collect()
-        return per_sensor_data, overall
-
-    def calculate_overall_max_min(self, per_sensor_data):
-        temp_val = [data['temp'] for data in per_sensor_data.values() if data['temp'] is not None]
-        hum_val = [data['hum'] for data in per_sensor_data.values() if data['hum'] is not None]
-        result = dict(
-            Temperature=dict(max=max(temp_val) if temp_val else None,
-                             min=min(temp_val) if temp_val else None),
-            Humidity=dict(max=max(hum_val) if hum_val else None,
-                          min=min(hum_val) if hum_val else None)
-        )
-        gc.collect()
-        return result
+        window = [None, None]
+        for wait in self.sampler.cycle(sensor_pin, self.pin_stats, window):
+            await asyncio.sleep_ms(wait)
+        self.window_ticks = (window[0], window[1])
+        return self.pin_stats
+
+    def is_ready(self):
+        return self.time_manager.ntp_sync and self.ethernet.isconnected() and self.mqtt_manager.is_mqtt_ready
 
-    async def send_or_backup(self, mac, topic, per_sensor, overall):
-        ready = (self.time_manager.ntp_sync and self.ethernet.isconnected() and self.mqtt_manager.is_mqtt_ready)
+    async def send_or_backup(self, mac, topic, per_sensor, overall, result):
+        ready = self.is_ready()
         print("[DEBUG]: NTP sync:", self.time_manager.ntp_sync)
         print("[DEBUG]: Ethernet connected:", self.ethernet.isconnected())
         print("[DEBUG]: MQTT ready:", self.mqtt_manager.is_mqtt_ready)
@@ -169,100 +240,289 @@ class DHT22_Manager:
         data_row = []
         for pin_num, data in per_sensor.items():
             data_row.append(dict(
-                mac=mac,
                 pin=pin_num,
                 avg_temp=data['temp'],
                 avg_hum=data['hum'],
                 max_temp=data['temp_max'],
                 min_temp=data['temp_min'],
                 max_hum=data['hum_max'],
-                min_hum=data['hum_min']
+                min_hum=data['hum_min'],
+                std_temp=data['temp_std'],
+                std_hum=data['hum_std']
             ))
 
-        ovr = self.calculate_overall_max_min(per_sensor)
         data_row.append(dict(
-            mac=mac,
             pin='OVERALL',
             avg_temp=overall['Temperature'],
             avg_hum=overall['Humidity'],
-            max_temp=ovr['Temperature']['max'],
-            min_temp=ovr['Temperature']['min'],
-            max_hum=ovr['Humidity']['max'],
-            min_hum=ovr['Humidity']['min']
+            max_temp=result['Temperature']['max'],
+            min_temp=result['Temperature']['min'],
+            max_hum=result['Humidity']['max'],
+            min_hum=result['Humidity']['min'],
+            std_temp=result['Temperature']['std'],
+            std_hum=result['Humidity']['std']
         ))
 
+        if self.publish_mode == 'deadband':
+            data_row = self.apply_deadband(data_row)
+            if not data_row:
+                gc.collect()
+                return
+
+        # Rows are stamped with the sampling window, not with the time they get published
+        start_ticks, end_ticks = self.window_ticks
+        if end_ticks is None:
+            start_ticks = end_ticks = time.ticks_ms()
         if ready:
-            timestamp = self.time_manager.now()
-            await self.resend_backup(topic)
-            failed = []
-            for data in data_row:
-                data['timestamp'] = timestamp
-                for key in ('avg_temp', 'avg_hum', 'max_temp', 'min_temp', 'max_hum', 'min_hum'):
-                    if data.get(key) is not None:
-                        data[key] = float(data[key])
-                if not await self.mqtt_manager.safe_publish(topic, data):
-                    failed.append((time.ticks_ms(), data.copy()))
-            if failed:
-                self.backup_to_csv(failed)
+            # Queued ahead of the backlog; whatever can't be delivered is backed up under end_ticks
+            sent = await self.publish_rows(topic, data_row, self.time_manager.epoch_at(end_ticks),
+                                           self.time_manager.epoch_at(start_ticks), ticks=end_ticks)
+            if sent < len(data_row):
+                self.backup(data_row[sent:], end_ticks)
             gc.collect()
             return
 
-        timestamp_anchor = time.ticks_ms()
-        records = [(timestamp_anchor, data.copy()) for data in data_row]
-        self.backup_to_csv(records)
+        self.backup(data_row, end_ticks)
         gc.collect()
 
 
-    def backup_to_csv(self, records):
-        first = self.backup_csv not in uos.listdir()
-        with open(self.backup_csv, 'a') as f:
-            if first:
-                f.write("ticks_ms,json\n")
-            for ts, payload in records:
-                f.write(f"{ts},{ujson.dumps(payload)}\n")
-        print(f"[SUCCESS]: Backup {len(records)} records")
+    def filter_stats(self):
+        # Samples the outlier filter threw away since boot, per pin [temp, hum], for the status heartbeat
+        filters = self.pin_filters
+        mode = filters[self.dht22_pins[0]].mode if filters else None
+        return dict(mode=mode, rejected={str(pin): [f.rejected[F_TEMP], f.rejected[F_HUM]] for pin, f in filters.items()})
+
+    def health_stats(self):
+        # Sensor pool, backup store and sampling ring counters for the status heartbeat
+        stats = dict(
+            sensors={str(pin): health for pin, health in self.sensor_pool.health().items()},
+            backup=dict(pending=self.backup_store.pending(), overwritten=self.backup_store.overwritten)
+        )
+        if self.sampling_thread:
+            stats['ring_dropped'] = self.sampling_thread.ring.dropped
+        return stats
+
+    def alarm_levels(self, pin):
+        engine = self.alarm_engine
+        return engine.level(pin, 'temp'), engine.level(pin, 'hum')
+
+    def _moved(self, last, value, band):
+        if last is None or value is None:
+            return last is not value
+        return abs(value - last) >= band
+
+    def apply_deadband(self, rows):
+        # Keep a row only if it moved past the deadband, changed alarm state or is due a heartbeat.
+        # Rows held back are counted and the count rides along on the next row that goes out.
+        now = time.ticks_ms()
+        selected = []
+        for row in rows:
+            pin = row['pin']
+            state = self.deadband_state.get(pin)
+            alarm = self.alarm_levels(pin)
+            if (state is None or alarm != state[3]
+                    or time.ticks_diff(now, state[2]) >= self.heartbeat_ms
+                    or self._moved(state[0], row['avg_temp'], self.deadband_temp)
+                    or self._moved(state[1], row['avg_hum'], self.deadband_hum)):
+                if state is not None and state[4]:
+                    row['suppressed'] = state[4]
+                self.deadband_state[pin] = [row['avg_temp'], row['avg_hum'], now, alarm, 0]
+                selected.append(row)
+            else:
+                state[4] += 1
+        if len(selected) < len(rows):
+            print(f"[DEBUG]: Deadband held back {len(rows) - len(selected)} rows")
+        return selected
+
+    def spiller(self, rows, ticks):
+        # Called by the publish queue for rows it could not deliver
+        return None if ticks is None else (lambda: self.backup(rows, ticks))
+
+    async def publish_rows(self, topic, rows, epoch, start_epoch=None, qos=0, lane=TELEMETRY, ticks=None):
+        # Returns how many rows went out; rows after the first failure are left to the caller.
+        # epoch is the end of the sampling window; start_epoch (if known) its start.
+        # With ticks (live rows) the rows are only queued, with undelivered ones backed up
+        # under ticks; without it each message's result is awaited (backlog replay).
+        wait = ticks is None
+        publish = self.mqtt_manager.publish
+        if self.payload_encoding == 'binary':
+            # All rows in one packed message, see TelemetryCodec
+            if len(self.bin_buf) < encoded_size(len(rows)):
+                self.bin_buf = bytearray(encoded_size(len(rows)))
+            n = encode_into(self.bin_buf, self.mac_bytes, epoch, rows)
+            # The queued message outlives this call (and QoS1 may retransmit it): copy out of bin_buf
+            payload = bytes(memoryview(self.bin_buf)[:n])
+            ok = await publish(topic, payload, lane, qos=qos, wait=wait, spill=self.spiller(rows, ticks))
+            return len(rows) if ok else 0
+        timestamp = self.time_manager.format_iso(epoch)
+        window_start = None if start_epoch is None else self.time_manager.format_iso(start_epoch)
+        if self.payload_format == 'batch':
+            payload = dict(mac=self.mac, timestamp=timestamp, rows=rows)
+            if window_start:
+                payload['window_start'] = window_start
+                payload['window_end'] = timestamp
+            ok = await publish(topic, payload, lane, qos=qos, wait=wait, spill=self.spiller(rows, ticks))
+            return len(rows) if ok else 0
+        sent = 0
+        for data in rows:
+            data['mac'] = self.mac
+            data['timestamp'] = timestamp
+            if window_start:
+                data['window_start'] = window_start
+                data['window_end'] = timestamp
+            if not await publish(topic, data, lane, qos=qos, wait=wait, spill=self.spiller([data], ticks)):
+                break
+            sent += 1
+        return sent
+
+    async def evaluate_alarms(self, per_sensor, overall):
+        # Runs right after a cycle is summarised so transitions don't wait on the telemetry path
+        values = [('OVERALL', 'temp', overall['Temperature']), ('OVERALL', 'hum', overall['Humidity'])]
+        for pin, data in per_sensor.items():
+            values.append((pin, 'temp', data['temp']))
+            values.append((pin, 'hum', data['hum']))
+            if overall['Temperature'] is not None and data['temp'] is not None:
+                values.append((pin, 'temp_dev', round(data['temp'] - overall['Temperature'], 2)))
+            if overall['Humidity'] is not None and data['hum'] is not None:
+                values.append((pin, 'hum_dev', round(data['hum'] - overall['Humidity'], 2)))
+        epoch = self.time_manager.epoch()
+        for pin, metric, prev, level, value in self.alarm_engine.evaluate(values):
+            print(f"[WARNING]: Alarm {pin} {metric} {LEVEL_NAMES[abs(prev)]} -> {LEVEL_NAMES[abs(level)]} ({value})")
+            self.pending_alerts.append(dict(
+                mac=self.mac,
+                pin=pin,
+                sensor_name='overall' if pin == 'OVERALL' else self.sensor_locations.get(pin, f"Sensor{pin}"),
+                metric=metric,
+                level=LEVEL_NAMES[abs(level)],
+                side=None if level == NORMAL else ('high' if level > 0 else 'low'),
+                prev=LEVEL_NAMES[abs(prev)],
+                value=value,
+                epoch=epoch,
+                timestamp=self.time_manager.format_iso(epoch)
+            ))
+        if len(self.pending_alerts) > 16:
+            # Offline for a long time: keep the latest transitions only
+            del self.pending_alerts[:len(self.pending_alerts) - 16]
+        await self.flush_alerts()
+
+    async def flush_alerts(self):
+        # Runs in the sampling cycle: each wait is bounded by the queue's block_ms, and an alert
+        # that isn't confirmed in time stays pending for the next cycle
+        while self.pending_alerts and self.is_ready():
+            if not await self.mqtt_manager.publish(self.alert_topic, self.pending_alerts[0], ALARM, wait=True):
+                break
+            self.pending_alerts.pop(0)
+
+    def is_overall_critical(self):
+        engine = self.alarm_engine
+        return abs(engine.level('OVERALL', 'temp')) == CRIT or abs(engine.level('OVERALL', 'hum')) == CRIT
+
+    async def publish_rollups(self, closed):
+        for period, start, rows in closed:
+            if not self.is_ready():
+                print(f"[WARNING]: Rollup {period}s @ {start} dropped (not connected)")
+                continue
+            payload = dict(mac=self.mac, tier=period, epoch=start,
+                           start=self.time_manager.format_iso(start), rows=rows)
+            await self.mqtt_manager.publish(self.rollup_topic, payload, TELEMETRY)
         gc.collect()
 
-    async def resend_backup(self, topic):
-        if self.backup_csv not in uos.listdir() or not self.time_manager.ntp_sync or self.time_manager.sync_ticks is None:
-            return
-        print("[INFO]: Resend backup data")
-        failures = []
-        with open(self.backup_csv, 'r') as f:
-            header = next(f)
-            for line in f:
-                ts_ms, json_str = line.rstrip().split(',', 1)
-                delta = time.ticks_diff(int(ts_ms), self.time_manager.sync_ticks)
-                payload = ujson.loads(json_str)
-                payload['timestamp'] = self.time_manager.iso_add_ms(self.time_manager.sync_iso, delta)
-                for key in ('avg_temp', 'avg_hum', 'max_temp', 'min_temp', 'max_hum', 'min_hum'):
-                    if payload.get(key) is not None:
-                        payload[key] = float(payload[key])
-                try:
-                    await self.mqtt_manager.safe_publish(topic, payload)
-                except Exception:
-                    failures.append(line)
-
-        if failures:
-            with open(self.backup_csv, 'w') as f:
-                f.write(header)
-                for line in failures:
-                    f.write(line)
-            print(f"[WARNING]: Backup retained {len(failures)} records")
+    def backup(self, rows, ticks=None):
+        # Rows are anchored to wall-clock epoch once time has been synced, ticks_ms before that;
+        # the store tags ticks anchors with the boot, as they can't be replayed after a reset
+        if ticks is None:
+            ticks = time.ticks_ms()
+        epoch = self.time_manager.epoch_at(ticks)
+        if epoch is None:
+            count = self.backup_store.append([(ticks, data) for data in rows])
         else:
-            uos.remove(self.backup_csv)
-            print(f"[SUCCESS]: Deleted {self.backup_csv}")
+            count = self.backup_store.append([(epoch, data) for data in rows], ANCHOR_EPOCH)
+        print(f"[SUCCESS]: Backup {count} records ({self.backup_store.pending()} pending)")
+        gc.collect()
+
+    def drop_backup_csv(self, filename):
+        # The old text backup is stamped with ticks_ms of the boot that wrote it, which can't be
+        # placed in time any more after a reset; remove it rather than replay it at the wrong time
+        if filename not in uos.listdir():
+            return
+        try:
+            with open(filename, 'r') as f:
+                count = sum(1 for _ in f) - 1
+            uos.remove(filename)
+            print(f"[WARNING]: Dropped {filename} ({max(count, 0)} records from an earlier boot)")
+        except Exception as e:
+            print(f"[ERROR]: Remove {filename} failed: {e}")
         gc.collect()
 
+    async def start_service_backlog_drain(self):
+        # Replays the backup store at BACKLOG_DRAIN_RATE records/s, independent of sampling.
+        # The read cursor lives in the store header, so a reset resumes where it stopped.
+        store = self.backup_store
+        while True:
+            gap_ms = int(1000 / self.drain_rate) if self.drain_rate > 0 else 0
+            if not store.pending() or not self.is_ready() or self.time_manager.sync_ticks is None:
+                await asyncio.sleep(self.dht22_interval)
+                continue
+            start_seq = store.read_seq
+            records = store.read(self.drain_batch)
+            # In batch/binary form the rows of one cycle (same anchor) are replayed as one message
+            group = self.payload_format == 'batch' or self.payload_encoding == 'binary'
+            sent = 0
+            tasks = []
+            try:
+                started = time.ticks_ms()
+                # All messages of the batch go out together (bounded by the client's in-flight
+                # window); the cursor only moves past the unbroken run of acked ones.
+                ends = []
+                i = 0
+                while i < len(records):
+                    anchor = records[i][1]
+                    flags = records[i][2]
+                    end = i + 1
+                    while group and end < len(records) and records[end][1] == anchor and records[end][2] == flags:
+                        end += 1
+                    rows = []
+                    if store.placeable(flags):
+                        rows = [rec[3] for rec in records[i:end] if rec[3] is not None]
+                    else:
+                        print(f"[WARNING]: Backlog dropped {end - i} records stamped before the sync of an earlier boot")
+                    if rows:
+                        epoch = anchor if flags & ANCHOR_EPOCH else self.time_manager.epoch_at(anchor)
+                        tasks.append(asyncio.create_task(
+                            self.publish_rows(self.dht22_topic, rows, epoch, qos=self.drain_qos, lane=BACKLOG)))
+                    else:
+                        tasks.append(None)
+                    ends.append((end, len(rows)))
+                    i = end
+                for task, (end, n) in zip(tasks, ends):
+                    if task is not None and await task < n:
+                        break
+                    sent = end
+                wait = gap_ms * len(records) - time.ticks_diff(time.ticks_ms(), started)
+                if wait > 0:
+                    await asyncio.sleep_ms(wait)
+            except Exception as e:
+                print(f"[ERROR]: Backlog drain failed: {e}")
+            # After a failure the rest of the batch is still queued or in flight: let it settle
+            # before the same records are read again, so no record has two copies under way
+            for task in tasks:
+                if task is not None:
+                    try:
+                        await task
+                    except Exception:
+                        pass
+            store.advance_to(start_seq + sent)
+            if sent < len(records) or not records:
+                print(f"[WARNING]: Backlog drain paused, {store.pending()} records pending")
+                await asyncio.sleep(self.dht22_interval * 5)
+            elif not store.pending():
+                print("[SUCCESS]: Backlog drained")
+            gc.collect()
+
     def send_result(self, per_sensor, overall, result):
-        is_alarm = False
-
-        if overall['Temperature'] is not None and not (self.min_temp_condition <= overall['Temperature'] <= self.max_temp_condition):
-            print(f"[WARNING]: Alarm Overall Temp {overall['Temperature']}°C")
-            is_alarm = True
-        if overall['Humidity'] is not None and not (self.min_hum_condition <= overall['Humidity'] <= self.max_hum_condition):
-            print(f"[WARNING]: Alarm Overall Hum {overall['Humidity']}%")
-            is_alarm = True
+        is_alarm = self.is_overall_critical()
+        if is_alarm:
+            print(f"[WARNING]: Alarm Overall (Temp {overall['Temperature']}°C) (Hum {overall['Humidity']}%)")
         self.led_manager.set_dht22_alarm(is_alarm)
         for pin, data in per_sensor.items():
             location = self.sensor_locations.get(pin, 'Unknown')
@@ -289,29 +549,86 @@ class DHT22_Manager:
         except Exception as e:
             print(f"[ERROR]: Failed to reset DHT22 config: {e}")
 
+    def record_cycle(self, collect):
+        # The part of a cycle that reads the raw per-pin stats; runs without yielding
+        per_sensor, overall, result = summarize(collect)
+        self.last_overall = overall
+        end_ticks = self.window_ticks[1]
+        epoch = self.time_manager.epoch_at(time.ticks_ms() if end_ticks is None else end_ticks)
+        closed = None
+        if epoch is not None:
+            self.history.record(epoch, per_sensor, overall)
+            closed = self.rollup.add(epoch, collect)
+        return per_sensor, overall, result, closed
+
+    async def finish_cycle(self, per_sensor, overall, result, closed):
+        await self.evaluate_alarms(per_sensor, overall)
+        if closed:
+            await self.publish_rollups(closed)
+        self.update_event.set()
+        await self.send_or_backup(self.mac, self.dht22_topic, per_sensor, overall, result)
+        self.send_result(per_sensor, overall, result)
+        gc.collect()
+
     async def start_service_dht22(self):
         self.led.on()
         if not self.check_config():
             print("[ERROR]: Invalid config")
             return None
+        await self.sensor_pool.start()
+        if self.sampling_mode == 'thread':
+            await self.start_service_sampling_thread()
+            return None
         while True:
+            clock = self.cycle_clock  # May be swapped by apply_config
+            if clock:
+                wait = clock.wait_ms()
+                if wait:
+                    await asyncio.sleep_ms(wait)
+                clock.started()
             try:
-                pins = await self.setup_pins()
+                pins = self.sensor_pool.available()
                 if not pins:
-                    print("[ERROR]: Setup pins failed")
+                    print("[ERROR]: No sensor available")
                     await asyncio.sleep(self.dht22_interval * 5)
                     continue
                 collect = await self.collect_data(pins)
-                per_sensor, overall = self.calculate_average(collect)
-                self.last_overall = overall
-                self.update_event.set()
-                result = self.calculate_overall_max_min(per_sensor)
-                await self.send_or_backup(self.mac, self.dht22_topic, per_sensor, overall)
-                self.send_result(per_sensor, overall, result)
-                gc.collect()
+                await self.finish_cycle(*self.record_cycle(collect))
             except Exception as e:
                 print(f"[ERROR]: Start service DHT22 failed: {e}")
                 gc.collect()
-            await asyncio.sleep(self.dht22_interval)
+            if not clock:
+                await asyncio.sleep(self.dht22_interval)
             gc.collect()
 
+    async def start_service_sampling_thread(self):
+        # SAMPLING_MODE "thread": reads happen on a second thread; this loop only consumes
+        # finished cycles from the ring and does the publishing side.
+        worker = Sampling_Thread(self.sensor_pool, self.sampler, self.cycle_clock,
+                                 interval=self.dht22_interval)
+        self.sampling_thread = worker
+        ring = worker.ring
+        worker.start()
+        print("[INFO]: Sampling thread started")
+        while True:
+            await ring.flag.wait()
+            while True:
+                slot = ring.peek()
+                if slot is None:
+                    break
+                try:
+                    collect, window = slot
+                    self.window_ticks = (window[0], window[1])
+                    cycle = self.record_cycle(collect)
+                except Exception as e:
+                    print(f"[ERROR]: Sampling thread cycle failed: {e}")
+                    cycle = None
+                # The slot goes back to the thread before the (slow) publishing starts
+                ring.release()
+                if cycle is None:
+                    continue
+                try:
+                    await self.finish_cycle(*cycle)
+                except Exception as e:
+                    print(f"[ERROR]: Start service DHT22 failed: {e}")
+                gc.collect()
@@ -2,6 +2,7 @@ import gc
 import uasyncio as asyncio
 from machine import Pin, I2C
 from i2c_lcd import I2cLcd
+from ConfigManager import Config_Manager
 
 DEG = chr(223)
 
@@ -10,7 +11,8 @@ class Display_Manager:
                  i2c_scl_pin=22, i2c_sda_pin=21,
                  i2c_id=0, lcd_addr=0x27,
                  lcd_cols=16, lcd_rows=2,
-                 refresh_interval=5):
+                 refresh_interval=5,
+                 config_file='display_config.json', default_file='display_default_config.json'):
 
         self.dht22 = dht22_manager
         self.ethernet = ethernet_manager
@@ -19,7 +21,9 @@ class Display_Manager:
 
         self.pages = ['dht', 'network_status', 'system_status']
         self.page = 0
-        self.interval = max(refresh_interval, 1)
+        self.config_manager = Config_Manager(config_file, default_config_file=default_file,
+                                             default_config={'refresh_interval': refresh_interval})
+        self.apply_config()
         self.cols = lcd_cols
         self.lcd = None
 
@@ -35,6 +39,11 @@ class Display_Manager:
             print(f"[WARNING]: LCD not initialized ({e})")
             self.lcd = None
 
+    def apply_config(self):
+        # Picked up by the refresh loop on its next pass
+        config = self.config_manager.load_config()
+        self.interval = max(config.get('refresh_interval', 5), 1)
+
     async def _update_screen(self):
         if self.lcd is None:
             return
@@ -88,6 +88,23 @@ class Ethernet_Manager:
         reset()
         return False
 
+    def apply_config(self):
+        # Re-reads the static addressing and sets it on the running interface, no W5500 reset.
+        # Returns True when it changed: sockets opened on the old address are then stale.
+        config = self.config.load_config()
+        addr = (config.get('eth_ip', '192.168.1.191'), config.get('eth_subnet', '255.255.255.0'),
+                config.get('eth_gateway', '192.168.1.1'), config.get('eth_dns', '8.8.8.8'))
+        if addr == (self.ip, self.subnet, self.gateway, self.dns):
+            return False
+        self.ip, self.subnet, self.gateway, self.dns = addr
+        if self.lan:
+            try:
+                self.lan.ifconfig(addr)
+                print("[SUCCESS]: Ethernet address applied", addr)
+            except Exception as e:
+                print("[WARNING]: ifconfig failed:", e)
+        return True
+
     def isconnected(self):
         return self.lan and self.lan.isconnected()
 
@@ -3,8 +3,13 @@ from mqtt_as import MQTTClient, config as mqtt_config
 import ujson
 import machine
 import gc
-import re
 from ConfigManager import Config_Manager
+from PublishQueue import Publish_Queue, ALARM, TELEMETRY, STATUS, POLICIES
+from TopicDispatcher import Topic_Dispatcher
+from CommandPool import Command_Pool
+from DHT22Manager import RESTART_KEYS
+
+HISTORY_MAX_POINTS = 180  # minutes per get_history response
 
 
 class MQTT_Manager:
@@ -16,34 +21,114 @@ class MQTT_Manager:
 
         self.ethernet = ethernet
         self.dht22_manager = dht22_manager
+        self.display_manager = None
         self.is_mqtt_ready = False
         self.mac = self.ethernet.get_mac()
         client_id = self.mac
-        lwt_topic = self.config_manager.get_config("lwt_topic", "esp32/status")
-        lwt_payload = ujson.dumps({"status": "offline", "mac": self.mac})
+        config = self.config_manager.load_config()
 
-        mqtt_config["will"] = (lwt_topic, lwt_payload, True, 1)
-        mqtt_config["server"] = self.config_manager.get_config("broker")
-        mqtt_config["port"] = self.config_manager.get_config("port", 1883)
-        mqtt_config["user"] = self.config_manager.get_config("user", "")
-        mqtt_config["password"] = self.config_manager.get_config("password", "")
-        mqtt_config["keepalive"] = self.config_manager.get_config("keepalive", 120)
+        self.will = self._will(config)
+        mqtt_config["will"] = self.will
+        self.broker_settings = self._broker_settings(config)
+        (mqtt_config["server"], mqtt_config["port"], mqtt_config["user"],
+         mqtt_config["password"], mqtt_config["keepalive"]) = self.broker_settings
         mqtt_config["client_id"] = client_id
-        mqtt_config["queue_len"] = 1
+        # MsgQueue holds queue_len - 1 messages; the command pool below empties it promptly
+        mqtt_config["queue_len"] = self.config_manager.get_config("queue_len", 4)
+        mqtt_config["max_inflight"] = self.config_manager.get_config("max_inflight", 8)
 
         MQTTClient.DEBUG = True
         self.client = MQTTClient(mqtt_config)
+        # Every producer publishes through this queue; one sender task talks to the client
+        self.out_queue = Publish_Queue(
+            self.safe_publish,
+            capacities=self.config_manager.get_config("queue_sizes", [8, 8, 2, 8]),
+            policy=self.config_manager.get_config("queue_policy", "drop_oldest"),
+            max_inflight=mqtt_config["max_inflight"],
+            block_ms=int(self.config_manager.get_config("queue_block_timeout", 2) * 1000)
+        )
 
-        self._status_topic = self.config_manager.get_config(
-            "status_topic",
-            "esp32/{}/status".format(client_id)
+        self._load_topics(config)
+        self.command_timeout = self.config_manager.get_config("command_timeout", 10)
+        self.dispatcher = Topic_Dispatcher()
+        self.register_handlers()
+        self.commands = Command_Pool(
+            self.dispatcher.dispatch,
+            self.reject_command,
+            workers=self.config_manager.get_config("command_workers", 2),
+            depth=self.config_manager.get_config("command_queue", 4)
         )
 
-        self.subscribe_topics = self.config_manager.get_config("subscribe_topics", [])
+        gc.collect()
+
+    # ---------- Config ----------
+    def _broker_settings(self, config):
+        return (config.get("broker"), int(config.get("port") or 1883), config.get("user") or "",
+                config.get("password") or "", config.get("keepalive", 120))
+
+    def _will(self, config):
+        lwt_payload = ujson.dumps({"status": "offline", "mac": self.mac})
+        return (config.get("lwt_topic", "esp32/status"), lwt_payload, True, 1)
+
+    def _load_topics(self, config):
+        self._status_topic = config.get("status_topic", "esp32/{}/status".format(self.mac))
+        self.subscribe_topics = config.get("subscribe_topics", [])
         if "esp32/control/+/reboot" not in self.subscribe_topics:
             self.subscribe_topics.append("esp32/control/+/reboot")
 
-        gc.collect()
+    async def apply_config(self, reconnect=False):
+        # Live counterpart of __init__. Topics, queue policy and max_inflight apply in place;
+        # a broker, credential, keepalive or last will change (the will is only sent with
+        # CONNECT), or reconnect=True after a local address change, restarts only the broker
+        # connection. queue_len, queue_sizes and command_* are read at start-up only.
+        # Returns True if the connection was restarted.
+        config = self.config_manager.load_config()
+        old_topics = self.subscribe_topics
+        self._load_topics(config)
+        policy = config.get("queue_policy", "drop_oldest")
+        if policy in POLICIES:
+            self.out_queue.policy = policy
+        self.out_queue.block_ms = int(config.get("queue_block_timeout", 2) * 1000)
+        max_inflight = max(config.get("max_inflight", 8), 1)
+        self.out_queue.max_inflight = max_inflight
+
+        broker = self._broker_settings(config)
+        will = self._will(config)
+        try:
+            if broker != self.broker_settings:
+                self.client.reconfigure(*broker)
+                self.broker_settings = broker
+                reconnect = True
+            if will != self.will:
+                self.client.reconfigure(will=will)
+                self.will = will
+                reconnect = True
+            self.client.reconfigure(max_inflight=max_inflight)
+        except Exception as e:
+            print("[ERROR]: Apply MQTT config failed:", e)
+            return False
+
+        if reconnect:
+            # connection_handler subscribes to the new topic list once it is back up
+            print("[INFO]: Reconnecting MQTT with the new settings")
+            self.client.reconnect()
+            return True
+        if self.is_mqtt_ready:
+            for topic in old_topics:
+                if topic not in self.subscribe_topics:
+                    try:
+                        await self.client.unsubscribe(topic)
+                        print("[DEBUG]: Unsubscribed from:", topic)
+                    except Exception as e:
+                        print("[ERROR]: Unsubscribe failed for", topic, "->", e)
+            for topic in self.subscribe_topics:
+                if topic not in old_topics:
+                    try:
+                        await self.client.subscribe(topic, 1)
+                        print("[DEBUG]: Subscribed to:", topic)
+                    except Exception as e:
+                        print("[ERROR]: Subscribe failed for", topic, "->", e)
+        return False
 
     # ---------- Utils ----------
     def is_connected(self):
@@ -54,7 +139,8 @@ class MQTT_Manager:
             print("[ERROR]: Publish failed (MQTT not ready)")
             return False
         try:
-            payload_str = ujson.dumps(data)
+            # Pre-encoded payloads (e.g. packed telemetry) are sent as-is
+            payload_str = data if isinstance(data, (bytes, bytearray, memoryview)) else ujson.dumps(data)
             await self.client.publish(topic, payload_str, retain=retain, qos=qos)
             print("[DEBUG]: Published to", topic)
             return True
@@ -62,144 +148,272 @@ class MQTT_Manager:
             print("[ERROR]: Publish failed:", e)
             return False
 
+    async def publish(self, topic, data, lane=TELEMETRY, retain=False, qos=0, wait=False, spill=None):
+        # Queued publish, see PublishQueue. wait=True returns whether it went out within block_ms.
+        return await self.out_queue.put(lane, topic, data, retain, qos, wait, spill)
+
     # ---------- Periodic status ----------
     async def publish_status_task(self):
         while True:
             await asyncio.sleep(19)
             if self.is_mqtt_ready:
                 payload = {"status": "online", "mac": self.mac}
-                await self.safe_publish(self._status_topic, payload, retain=False)
+                if self.dht22_manager:
+                    payload["cycle"] = self.dht22_manager.cycle_stats
+                    payload["filter"] = self.dht22_manager.filter_stats()
+                    payload["rates"] = {str(pin): rates for pin, rates in self.dht22_manager.sampler.sample_rates.items()}
+                    payload.update(self.dht22_manager.health_stats())
+                payload["queue"] = self.out_queue.stats()
+                commands = self.commands.stats
+                commands["pending"] = self.commands.pending()
+                commands["discards"] = self.client.queue.discards
+                payload["commands"] = commands
+                await self.publish(self._status_topic, payload, STATUS)
 
     # ---------- Incoming messages ----------
+    def register_handlers(self):
+        # New device commands only need a line here; see TopicDispatcher.
+        # No timeout on set_config or reboot. A reboot ends in a reset anyway. set_config saves
+        # files and then applies them, and cutting it off part way would leave the config half
+        # written or half applied; its only waits (the replies) are bounded by the queue's block_ms.
+        d = self.dispatcher
+        d.register("esp32/commands", self.handle_get_config, command="get_config", timeout=self.command_timeout)
+        d.register("esp32/commands", self.handle_get_history, command="get_history", timeout=self.command_timeout)
+        d.register("esp32/set_config", self.handle_set_config, command="set_config")
+        d.register("esp32/control/+/reboot", self.handle_reboot)
+
     async def message_handler(self):
-        # Requires mqtt_config["queue_len"] >= 1
+        # Requires mqtt_config["queue_len"] >= 1. Only hands messages to the command pool,
+        # so the client's queue is drained however long a command takes.
         async for topic, msg, retained in self.client.queue:
             try:
                 t = topic.decode("utf-8")
-                p = msg.decode("utf-8")
-                print("[DEBUG]: MQTT message on '{}': {}".format(t, p))
-
-                try:
-                    data = ujson.loads(p) if p else {}
-                except Exception:
-                    data = {}
-
-                command = data.get("command")
-                
-                # ===== GET CONFIG =====
-                if t == "esp32/commands" and command == "get_config":
-                    print("[INFO]: get_config received, collecting...")
-                    ethernet_config = self.ethernet.config.load_config()
-                    mqtt_config_data = self.config_manager.load_config()
-                    dht22_config = self.dht22_manager.config_manager.load_config()
-                    request_id = data.get("requestId")
-                    response_payload = {
-                        "mac_address": self.mac,
-                        "ethernet": ethernet_config,
-                        "mqtt": mqtt_config_data,
-                        "alerts": {
-                            "temp_crit_low":  dht22_config.get("CON_TEMP_MIN"),
-                            "temp_warn_low":  dht22_config.get("CON_TEMP_WARN_LOW"),
-                            "temp_warn_high": dht22_config.get("CON_TEMP_WARN_HIGH"),
-                            "temp_crit_high": dht22_config.get("CON_TEMP_MAX"),
-                            "hum_crit_low":   dht22_config.get("CON_HUM_MIN"),
-                            "hum_warn_low":   dht22_config.get("CON_HUM_WARN_LOW"),
-                            "hum_warn_high":  dht22_config.get("CON_HUM_WARN_HIGH"),
-                            "hum_crit_high":  dht22_config.get("CON_HUM_MAX"),
-                        },
-                    }
-                    if request_id:
-                        response_payload["requestId"] = request_id
-                    response_topic = "esp32/response/{}/config".format(self.mac.replace(":", ""))
-                    await self.safe_publish(response_topic, response_payload)
-
-                # ===== SET CONFIG =====
-                elif t == "esp32/set_config" and command == "set_config":
-                    settings = data.get("settings", {})
-                    print("[INFO]: set_config received, applying...")
-
-                    if "ethernet" in settings:
-                        eth_conf = settings["ethernet"]
-                        formatted_eth = {
-                            "eth_ip":      eth_conf.get("ip"),
-                            "eth_subnet":  eth_conf.get("subnet"),
-                            "eth_gateway": eth_conf.get("gateway"),
-                            "eth_dns":     eth_conf.get("dns"),
-                        }
-                        self.ethernet.config.save_config(formatted_eth)
-                        print("[SUCCESS]: Ethernet config updated")
-
-                    if "mqtt" in settings:
-                        mconf = settings["mqtt"]
-                        formatted_mqtt = {
-                            "broker":   mconf.get("broker"),
-                            "port":     int(mconf.get("port") or 1883),
-                            "user":     mconf.get("user"),
-                            "password": mconf.get("pass"),
-                        }
-                        self.config_manager.save_config(formatted_mqtt)
-                        print("[SUCCESS]: MQTT config updated")
-
-                    if "alerts" in settings:
-                        alerts_conf = settings.get("alerts", {})
-                        temp_alerts = alerts_conf.get("temp", {})
-                        hum_alerts  = alerts_conf.get("hum",  {})
-
-                        formatted_alerts = {
-                            "CON_TEMP_MIN":       temp_alerts.get("critLow"),
-                            "CON_TEMP_WARN_LOW":  temp_alerts.get("warnLow"),
-                            "CON_TEMP_WARN_HIGH": temp_alerts.get("warnHigh"),
-                            "CON_TEMP_MAX":       temp_alerts.get("critHigh"),
-                            "CON_HUM_MIN":        hum_alerts.get("critLow"),
-                            "CON_HUM_WARN_LOW":   hum_alerts.get("warnLow"),
-                            "CON_HUM_WARN_HIGH":  hum_alerts.get("warnHigh"),
-                            "CON_HUM_MAX":        hum_alerts.get("critHigh"),
-                        }
-                        self.dht22_manager.config_manager.save_config(formatted_alerts)
-                        print("[SUCCESS]: Alerts config updated")
-
-                    print("[INFO]: Rebooting in 3 seconds to apply changes...")
-                    await asyncio.sleep(3)
-                    machine.reset()
-
-                # ===== REBOOT (ใช้ MAC ตรวจสอบ) =====
-                elif re.match(r"^esp32/control/[^/]+/reboot$", t):
-                    target_mac = (data.get("mac") or "").upper()
-                    action_id  = data.get("actionId")
-                    room_id    = (data.get("room_id") or "").lower()
-                    my_mac = self.mac.upper()
-                    m = re.match(r"^esp32/control/([^/]+)/reboot$", t)
-                    path_key = m.group(1) if m else ""
-
-                    should_reboot = False
-                    if target_mac and target_mac == my_mac:
-                        should_reboot = True
-                    elif path_key and path_key.upper() == my_mac:
-                        should_reboot = True
-                    else:
-                        should_reboot = False
-
-                    if should_reboot:
-                        print("[INFO]: Reboot command matched this device. Ack then reboot.")
-                        
-                        ack_topic = ""
-                        if room_id:
-                            ack_topic = "esp32/ack/{}/reboot".format(room_id)
-                        else:
-                            ack_topic = "esp32/ack/{}/reboot".format(self.mac)
-                        
-                        ack_payload = {"ok": True, "message": "rebooting", "actionId": action_id, "mac": self.mac}
-                        
-                        await self.safe_publish(ack_topic, ack_payload)
-
-                        await asyncio.sleep(0.25)
-                        machine.reset()
-                    else:
-                        print("[INFO]: Reboot command ignored (not my MAC)")
-
+                print("[DEBUG]: MQTT message on '{}' ({} bytes)".format(t, len(msg)))
+                await self.commands.submit(t, msg)
             except Exception as e:
                 print("[ERROR]: Processing message failed:", e)
 
+    async def reject_command(self, topic, msg, reason):
+        try:
+            data = ujson.loads(msg.decode("utf-8")) if msg else {}
+        except Exception:
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        response_payload = {"mac_address": self.mac, "error": "busy", "reason": reason, "topic": topic}
+        for key in ("command", "requestId", "actionId"):
+            if data.get(key):
+                response_payload[key] = data[key]
+        response_topic = "esp32/response/{}/busy".format(self.mac.replace(":", ""))
+        await self.publish(response_topic, response_payload, ALARM)
+
+    # ===== GET CONFIG =====
+    async def handle_get_config(self, topic, data, args):
+        print("[INFO]: get_config received, collecting...")
+        ethernet_config = self.ethernet.config.load_config()
+        mqtt_config_data = self.config_manager.load_config()
+        dht22_config = self.dht22_manager.config_manager.load_config()
+        request_id = data.get("requestId")
+        response_payload = {
+            "mac_address": self.mac,
+            "ethernet": ethernet_config,
+            "mqtt": mqtt_config_data,
+            "alerts": {
+                "temp_crit_low":  dht22_config.get("CON_TEMP_MIN"),
+                "temp_warn_low":  dht22_config.get("CON_TEMP_WARN_LOW"),
+                "temp_warn_high": dht22_config.get("CON_TEMP_WARN_HIGH"),
+                "temp_crit_high": dht22_config.get("CON_TEMP_MAX"),
+                "hum_crit_low":   dht22_config.get("CON_HUM_MIN"),
+                "hum_warn_low":   dht22_config.get("CON_HUM_WARN_LOW"),
+                "hum_warn_high":  dht22_config.get("CON_HUM_WARN_HIGH"),
+                "hum_crit_high":  dht22_config.get("CON_HUM_MAX"),
+            },
+        }
+        if request_id:
+            response_payload["requestId"] = request_id
+        response_topic = "esp32/response/{}/config".format(self.mac.replace(":", ""))
+        await self.publish(response_topic, response_payload, ALARM)
+
+    # ===== GET HISTORY =====
+    async def handle_get_history(self, topic, data, args):
+        target_mac = (data.get("mac") or "").upper()
+        if target_mac and target_mac != self.mac.upper():
+            return
+        pin = data.get("pin", "OVERALL")
+        if isinstance(pin, str) and pin.isdigit():
+            pin = int(pin)
+        minutes = data.get("minutes", 60)
+        end = data.get("end")
+        response_payload = {"mac_address": self.mac, "pin": pin}
+        reason = None
+        if isinstance(minutes, bool) or not isinstance(minutes, int) or minutes < 1:
+            reason = "minutes must be a positive integer"
+        elif end is not None and (isinstance(end, bool) or not isinstance(end, int) or end < 0):
+            reason = "end must be epoch seconds"
+        if reason:
+            response_payload["error"] = "invalid request"
+            response_payload["reason"] = reason
+        else:
+            history = self.dht22_manager.history.query(pin, min(minutes, HISTORY_MAX_POINTS), end)
+            if history is None:
+                response_payload["error"] = "no history"
+            else:
+                response_payload.update(history)
+        request_id = data.get("requestId")
+        if request_id:
+            response_payload["requestId"] = request_id
+        response_topic = "esp32/response/{}/history".format(self.mac.replace(":", ""))
+        await self.publish(response_topic, response_payload, ALARM)
+
+    # ===== SET CONFIG =====
+    async def handle_set_config(self, topic, data, args):
+        # Settings are checked, saved, acknowledged, then applied in place. Only a change to a key in
+        # DHT22Manager.RESTART_KEYS (or "reboot": true) still resets the board.
+        settings = data.get("settings", {})
+        print("[INFO]: set_config received, applying...")
+        response_topic = "esp32/response/{}/set_config".format(self.mac.replace(":", ""))
+        request_id = data.get("requestId")
+
+        # Everything is checked before anything is saved (DHT22 changes against the merged config),
+        # so a rejected command leaves every config file and the running service as they were
+        error = None
+        interval = None
+        if "display" in settings and self.display_manager:
+            try:
+                interval = int(settings["display"].get("interval") or 0)
+            except (TypeError, ValueError):
+                interval = -1
+            if interval < 0:
+                error = "display interval must be a number of seconds"
+        port = 1883
+        if "mqtt" in settings:
+            try:
+                port = int(settings["mqtt"].get("port") or 1883)
+            except (TypeError, ValueError):
+                port = 0
+            if not 0 < port < 65536:
+                error = "mqtt port must be 1-65535"
+        dht22_updates = {}
+        if "alerts" in settings:
+            alerts_conf = settings.get("alerts", {})
+            temp_alerts = alerts_conf.get("temp", {})
+            hum_alerts  = alerts_conf.get("hum",  {})
+            dht22_updates.update({
+                "CON_TEMP_MIN":       temp_alerts.get("critLow"),
+                "CON_TEMP_WARN_LOW":  temp_alerts.get("warnLow"),
+                "CON_TEMP_WARN_HIGH": temp_alerts.get("warnHigh"),
+                "CON_TEMP_MAX":       temp_alerts.get("critHigh"),
+                "CON_HUM_MIN":        hum_alerts.get("critLow"),
+                "CON_HUM_WARN_LOW":   hum_alerts.get("warnLow"),
+                "CON_HUM_WARN_HIGH":  hum_alerts.get("warnHigh"),
+                "CON_HUM_MAX":        hum_alerts.get("critHigh"),
+            })
+        formatted_dht22 = {}
+        if "dht22" in settings:
+            # Raw DHT22 keys (SAMPLE_COUNT, DHT22_INTERVAL, ...); keys unknown to the defaults are ignored
+            known = self.dht22_manager.config_manager.default_config
+            formatted_dht22 = {k: v for k, v in settings["dht22"].items() if k in known}
+            dht22_updates.update(formatted_dht22)
+        if dht22_updates and not error:
+            candidate = self.dht22_manager.config_manager.load_config()
+            candidate.update(dht22_updates)
+            error = self.dht22_manager.config_error(candidate)
+        if error:
+            print("[ERROR]: set_config rejected:", error)
+            response_payload = {"mac_address": self.mac, "ok": False, "error": "invalid config", "reason": error}
+            if request_id:
+                response_payload["requestId"] = request_id
+            await self.publish(response_topic, response_payload, ALARM, wait=True)
+            return
+
+        if "ethernet" in settings:
+            eth_conf = settings["ethernet"]
+            formatted_eth = {
+                "eth_ip":      eth_conf.get("ip"),
+                "eth_subnet":  eth_conf.get("subnet"),
+                "eth_gateway": eth_conf.get("gateway"),
+                "eth_dns":     eth_conf.get("dns"),
+            }
+            self.ethernet.config.save_config(formatted_eth)
+            print("[SUCCESS]: Ethernet config updated")
+
+        if "mqtt" in settings:
+            mconf = settings["mqtt"]
+            formatted_mqtt = {
+                "broker":   mconf.get("broker"),
+                "port":     port,
+                "user":     mconf.get("user"),
+                "password": mconf.get("pass"),
+            }
+            self.config_manager.save_config(formatted_mqtt)
+            print("[SUCCESS]: MQTT config updated")
+
+        if dht22_updates:
+            self.dht22_manager.config_manager.save_config(dht22_updates)
+            print("[SUCCESS]: DHT22 config updated")
+        restart = [k for k in formatted_dht22 if k in RESTART_KEYS]
+
+        if interval:
+            self.display_manager.config_manager.save_config({"refresh_interval": interval})
+            print("[SUCCESS]: Display config updated")
+
+        reboot = bool(restart or settings.get("reboot"))
+        response_payload = {"mac_address": self.mac, "ok": True, "reboot": reboot}
+        if restart:
+            response_payload["restart_keys"] = restart
+        if request_id:
+            response_payload["requestId"] = request_id
+        # Acknowledged before anything that could take the connection down
+        await self.publish(response_topic, response_payload, ALARM, wait=True)
+
+        if reboot:
+            print("[INFO]: Rebooting in 3 seconds to apply changes...")
+            await asyncio.sleep(3)
+            machine.reset()
+
+        if dht22_updates:
+            self.dht22_manager.apply_config()
+        if "display" in settings and self.display_manager:
+            self.display_manager.apply_config()
+        eth_changed = "ethernet" in settings and self.ethernet.apply_config()
+        await self.apply_config(reconnect=eth_changed)
+        print("[SUCCESS]: Config applied without reboot")
+
+    # ===== REBOOT (ใช้ MAC ตรวจสอบ) =====
+    async def handle_reboot(self, topic, data, args):
+        # args[0]: the '+' level of esp32/control/+/reboot
+        target_mac = (data.get("mac") or "").upper()
+        action_id  = data.get("actionId")
+        room_id    = (data.get("room_id") or "").lower()
+        my_mac = self.mac.upper()
+        path_key = args[0]
+
+        should_reboot = False
+        if target_mac and target_mac == my_mac:
+            should_reboot = True
+        elif path_key and path_key.upper() == my_mac:
+            should_reboot = True
+        else:
+            should_reboot = False
+
+        if should_reboot:
+            print("[INFO]: Reboot command matched this device. Ack then reboot.")
+            
+            ack_topic = ""
+            if room_id:
+                ack_topic = "esp32/ack/{}/reboot".format(room_id)
+            else:
+                ack_topic = "esp32/ack/{}/reboot".format(self.mac)
+            
+            ack_payload = {"ok": True, "message": "rebooting", "actionId": action_id, "mac": self.mac}
+            
+            await self.publish(ack_topic, ack_payload, ALARM, wait=True)
+
+            await asyncio.sleep(0.25)
+            machine.reset()
+        else:
+            print("[INFO]: Reboot command ignored (not my MAC)")
+
     # ---------- Connection lifecycle ----------
     async def connection_handler(self):
         while True:
@@ -212,7 +426,7 @@ class MQTT_Manager:
                 self.ethernet.update_mqtt_status(True)
 
             payload = {"status": "online", "mac": self.mac}
-            await self.safe_publish(self._status_topic, payload, retain=True)
+            await self.publish(self._status_topic, payload, STATUS, retain=True)
 
             for topic in self.subscribe_topics:
                 try:
@@ -238,6 +452,8 @@ class MQTT_Manager:
             print("[ERROR]: Cannot start MQTT — Time not synced")
             await asyncio.sleep(5)
 
+        asyncio.create_task(self.out_queue.run())
+        self.commands.start()
         asyncio.create_task(self.connection_handler())
         asyncio.create_task(self.publish_status_task())
         asyncio.create_task(self.message_handler())
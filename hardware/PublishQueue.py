@@ -0,0 +1,170 @@
+import time
+import uasyncio as asyncio
+
+# Lanes, highest priority first
+ALARM = 0      # alarm transitions and command responses
+TELEMETRY = 1  # live readings and rollups
+STATUS = 2     # online status / heartbeat
+BACKLOG = 3    # replay from the backup store
+LANE_NAMES = ('alarm', 'telemetry', 'status', 'backlog')
+POLICIES = ('drop_oldest', 'spill', 'block')
+
+# Entry layout
+_LANE, _TOPIC, _DATA, _RETAIN, _QOS, _SPILL, _EVT, _OK = range(8)
+
+
+class Publish_Queue:
+    # Fixed-capacity priority lanes drained by one sender task (run), so producers only
+    # wait on each other as far as the queue says. A fire-and-forget put into a full lane
+    # follows `policy`: drop_oldest evicts the lane's oldest entry, spill does the same but
+    # hands it to its spill callback (e.g. the backup store) first, block waits for room
+    # and spills (or drops) the oldest entry if none comes within block_ms.
+    # A put that waits for its result waits up to block_ms in all (for room, then for the
+    # send) and returns False when that runs out. If the message is still queued then it is
+    # withdrawn, so a retry by the caller is the only copy; one the client already holds
+    # (e.g. waiting out a reconnect) may still go out.
+    # block_ms keeps a sender stuck in a reconnect from stalling producers like the sampler.
+    def __init__(self, send_fn, capacities=(8, 8, 2, 8), policy='drop_oldest', max_inflight=8, block_ms=2000):
+        # send_fn(topic, data, retain, qos) -> bool, e.g. MQTT_Manager.safe_publish
+        self.send_fn = send_fn
+        self.policy = policy if policy in POLICIES else 'drop_oldest'
+        self.max_inflight = max(int(max_inflight), 1)
+        self.block_ms = block_ms
+        self.lanes = [[None] * max(int(c), 1) for c in capacities]
+        self.head = [0] * len(self.lanes)
+        self.count = [0] * len(self.lanes)
+        self.inflight = 0
+        self.ready = asyncio.Event()  # something was queued
+        self.space = asyncio.Event()  # an entry left a lane
+        self.slot = asyncio.Event()   # a QoS1 send finished
+        self.counters = [dict(sent=0, failed=0, dropped=0, spilled=0, peak=0) for _ in self.lanes]
+
+    async def put(self, lane, topic, data, retain=False, qos=0, wait=False, spill=None):
+        # wait=False: returns once queued. wait=True: returns whether the message went out.
+        # spill() is called if the message is evicted under "spill" or fails to send.
+        ring = self.lanes[lane]
+        deadline = time.ticks_add(time.ticks_ms(), self.block_ms)
+        if self.count[lane] >= len(ring) and (wait or self.policy == 'block'):
+            if not await self._room(lane, deadline) and wait:
+                self.counters[lane]['failed'] += 1
+                return False
+        while self.count[lane] >= len(ring):
+            self._evict(lane)
+        entry = [lane, topic, data, retain, qos, spill, asyncio.Event() if wait else None, False]
+        ring[(self.head[lane] + self.count[lane]) % len(ring)] = entry
+        self.count[lane] += 1
+        counters = self.counters[lane]
+        if self.count[lane] > counters['peak']:
+            counters['peak'] = self.count[lane]
+        self.ready.set()
+        if not wait:
+            return True
+        try:
+            await asyncio.wait_for_ms(entry[_EVT].wait(), max(time.ticks_diff(deadline, time.ticks_ms()), 0))
+        except asyncio.TimeoutError:
+            if any(e is entry for e in ring):
+                entry[_OK] = None  # withdrawn: run() discards it when it comes up
+                counters['failed'] += 1
+            return False
+        return entry[_OK]
+
+    async def _room(self, lane, deadline):
+        # Waits until deadline for a free slot in lane; returns whether there is one
+        while self.count[lane] >= len(self.lanes[lane]):
+            left = time.ticks_diff(deadline, time.ticks_ms())
+            if left <= 0:
+                return False
+            self.space.clear()
+            try:
+                await asyncio.wait_for_ms(self.space.wait(), left)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def _take(self, lane):
+        ring = self.lanes[lane]
+        entry = ring[self.head[lane]]
+        ring[self.head[lane]] = None
+        self.head[lane] = (self.head[lane] + 1) % len(ring)
+        self.count[lane] -= 1
+        self.space.set()
+        return entry
+
+    def _evict(self, lane):
+        entry = self._take(lane)
+        if entry[_OK] is None:
+            return
+        counters = self.counters[lane]
+        if self.policy != 'drop_oldest' and entry[_SPILL]:
+            counters['spilled'] += 1
+            self._spill(entry)
+            what = 'spilled'
+        else:
+            counters['dropped'] += 1
+            what = 'dropped'
+        print(f"[WARNING]: Publish queue {LANE_NAMES[lane]} full, oldest message {what}")
+        if entry[_EVT]:
+            entry[_EVT].set()
+
+    def _spill(self, entry):
+        try:
+            entry[_SPILL]()
+        except Exception as e:
+            print(f"[ERROR]: Publish queue spill failed: {e}")
+
+    def _next(self):
+        for lane in range(len(self.lanes)):
+            if self.count[lane]:
+                return self._take(lane)
+        return None
+
+    async def run(self):
+        while True:
+            entry = self._next()
+            if entry is None:
+                self.ready.clear()
+                await self.ready.wait()
+                continue
+            if entry[_OK] is None:
+                continue
+            if entry[_QOS]:
+                # A QoS1 send waits on its PUBACK: keep up to max_inflight of them going
+                while self.inflight >= self.max_inflight:
+                    self.slot.clear()
+                    await self.slot.wait()
+                self.inflight += 1
+                asyncio.create_task(self._send(entry))
+            else:
+                await self._send(entry)
+
+    async def _send(self, entry):
+        try:
+            ok = await self.send_fn(entry[_TOPIC], entry[_DATA], entry[_RETAIN], entry[_QOS])
+        except Exception as e:
+            print(f"[ERROR]: Publish queue send failed: {e}")
+            ok = False
+        counters = self.counters[entry[_LANE]]
+        if ok:
+            counters['sent'] += 1
+        elif entry[_SPILL]:
+            counters['spilled'] += 1
+            self._spill(entry)
+        else:
+            counters['failed'] += 1
+        entry[_OK] = ok
+        if entry[_EVT]:
+            entry[_EVT].set()
+        if entry[_QOS]:
+            self.inflight -= 1
+            self.slot.set()
+
+    def depth(self):
+        return sum(self.count)
+
+    def stats(self):
+        lanes = {}
+        for lane, name in enumerate(LANE_NAMES):
+            counters = self.counters[lane]
+            counters['depth'] = self.count[lane]
+            lanes[name] = counters
+        return dict(policy=self.policy, depth=self.depth(), inflight=self.inflight, lanes=lanes)
@@ -0,0 +1,88 @@
+from array import array
+
+# Channel indexes inside a Sample_Filter
+TEMP = 0
+HUM = 1
+MODES = ('none', 'mad', 'median', 'ema')
+
+
+def _median(values, n):
+    # In-place insertion sort of the first n items; n is the (small) filter window
+    for i in range(1, n):
+        x = values[i]
+        j = i - 1
+        while j >= 0 and values[j] > x:
+            values[j + 1] = values[j]
+            j -= 1
+        values[j + 1] = x
+    mid = n // 2
+    return values[mid] if n % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+class Sample_Filter:
+    # One per pin. Every mode except 'none' first drops samples that sit more than
+    # mad_k robust sigmas (1.4826 * MAD, never below min_dev) from the median of the
+    # last `window` accepted samples; then
+    #   mad    passes the accepted sample through
+    #   median outputs the median of the window
+    #   ema    outputs an exponential moving average (alpha)
+    # The window spans cycles, so it works with small SAMPLE_COUNT values too.
+    def __init__(self, mode='none', window=5, mad_k=3.5, min_dev=(0.5, 2.0), alpha=0.3):
+        self.mode = mode if mode in MODES else 'none'
+        self.window = max(int(window), 3)
+        self.mad_k = mad_k * 1.4826
+        self.min_dev = min_dev
+        self.alpha = alpha
+        self.win = array('f', [0.0] * (2 * self.window))
+        self.scratch = array('f', [0.0] * self.window)
+        self.fill = array('H', [0, 0])
+        self.head = array('H', [0, 0])
+        self.streak = array('H', [0, 0])
+        self.ema = array('f', [0.0, 0.0])
+        self.rejected = array('I', [0, 0])  # since boot, per channel
+
+    def reset(self):
+        for ch in (TEMP, HUM):
+            self.fill[ch] = 0
+            self.head[ch] = 0
+            self.streak[ch] = 0
+
+    def _window_median(self, ch, deviation=None):
+        n = self.fill[ch]
+        base = ch * self.window
+        scratch = self.scratch
+        for i in range(n):
+            v = self.win[base + i]
+            scratch[i] = v if deviation is None else abs(v - deviation)
+        return _median(scratch, n)
+
+    def _push(self, ch, x):
+        self.win[ch * self.window + self.head[ch]] = x
+        self.head[ch] = (self.head[ch] + 1) % self.window
+        if self.fill[ch] < self.window:
+            self.fill[ch] += 1
+
+    def apply(self, ch, x):
+        # Returns the value to accumulate, or None when the sample is rejected
+        if x is None or self.mode == 'none':
+            return x
+        if self.fill[ch] >= 3:
+            med = self._window_median(ch)
+            limit = max(self.mad_k * self._window_median(ch, med), self.min_dev[ch])
+            if abs(x - med) > limit:
+                self.streak[ch] += 1
+                if self.streak[ch] < self.window:
+                    self.rejected[ch] += 1
+                    return None
+                # The level really moved (or the window is stale); start over from here
+                self.fill[ch] = 0
+                self.head[ch] = 0
+        self.streak[ch] = 0
+        first = self.fill[ch] == 0
+        self._push(ch, x)
+        if self.mode == 'median':
+            return self._window_median(ch)
+        if self.mode == 'ema':
+            self.ema[ch] = x if first else self.ema[ch] + self.alpha * (x - self.ema[ch])
+            return self.ema[ch]
+        return x
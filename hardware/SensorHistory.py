@@ -0,0 +1,69 @@
+from array import array
+from TelemetryCodec import to_fixed, NONE_VALUE, SCALE
+
+
+class Sensor_History:
+    def __init__(self, pins, minutes=360):
+        # One int16 slot per minute per key (pins + OVERALL), in hundredths; fixed size for the whole run
+        self.keys = list(pins) + ['OVERALL']
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.slots = max(int(minutes), 1)
+        size = len(self.keys) * self.slots
+        self.temp = array('h', [NONE_VALUE] * size)
+        self.hum = array('h', [NONE_VALUE] * size)
+        self.head = None  # epoch minute held by the newest slot
+        # Running sums for the minute that is still open
+        self._sum = array('f', [0.0] * (len(self.keys) * 2))
+        self._cnt = array('H', [0] * (len(self.keys) * 2))
+
+    def _advance(self, minute):
+        if self.head is not None and minute <= self.head:
+            return
+        steps = self.slots if self.head is None else min(minute - self.head, self.slots)
+        for step in range(steps):
+            slot = (minute - step) % self.slots
+            for k in range(len(self.keys)):
+                self.temp[k * self.slots + slot] = NONE_VALUE
+                self.hum[k * self.slots + slot] = NONE_VALUE
+        for i in range(len(self._cnt)):
+            self._sum[i] = 0.0
+            self._cnt[i] = 0
+        self.head = minute
+
+    def _put(self, key, ch, values, value):
+        if value is None:
+            return
+        i = self.index[key] * 2 + ch
+        self._sum[i] += value
+        self._cnt[i] += 1
+        values[self.index[key] * self.slots + self.head % self.slots] = to_fixed(self._sum[i] / self._cnt[i])
+
+    def record(self, epoch, per_sensor, overall):
+        # Cycles landing in the same minute are averaged into that minute's slot
+        minute = epoch // 60
+        if self.head is not None and minute < self.head:
+            return
+        self._advance(minute)
+        for pin, data in per_sensor.items():
+            if pin in self.index:
+                self._put(pin, 0, self.temp, data['temp'])
+                self._put(pin, 1, self.hum, data['hum'])
+        self._put('OVERALL', 0, self.temp, overall['Temperature'])
+        self._put('OVERALL', 1, self.hum, overall['Humidity'])
+
+    def query(self, key, minutes, end=None):
+        # Oldest-first minute values up to `end` (epoch seconds, default newest); None when unknown
+        if self.head is None or key not in self.index:
+            return None
+        last = self.head if end is None else min(end // 60, self.head)
+        count = max(min(int(minutes), self.slots - (self.head - last)), 0)
+        base = self.index[key] * self.slots
+        temp = []
+        hum = []
+        for minute in range(last - count + 1, last + 1):
+            slot = base + minute % self.slots
+            t = self.temp[slot]
+            h = self.hum[slot]
+            temp.append(None if t == NONE_VALUE else t)
+            hum.append(None if h == NONE_VALUE else h)
+        return dict(start=(last - count + 1) * 60, step=60, scale=SCALE, temp=temp, hum=hum)
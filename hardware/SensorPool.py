@@ -0,0 +1,100 @@
+import time
+import gc
+import uasyncio as asyncio
+
+
+def dht22_driver(pin_num):
+    import dht
+    from machine import Pin
+    return dht.DHT22(Pin(pin_num, mode=Pin.OPEN_DRAIN, pull=Pin.PULL_UP))
+
+
+class Sensor_Pool:
+    def __init__(self, pins, driver=dht22_driver, fail_threshold=3,
+                 backoff_ms=10000, max_backoff_ms=600000):
+        self.pins = list(pins)
+        self.driver = driver
+        self.fail_threshold = max(int(fail_threshold), 1)
+        self.backoff_ms = backoff_ms
+        self.max_backoff_ms = max(max_backoff_ms, backoff_ms)
+        self.sensors = {}
+        self.failures = {pin: 0 for pin in self.pins}
+        self.delay = {pin: 0 for pin in self.pins}
+        self.retry_at = {pin: None for pin in self.pins}
+        self.reinits = {pin: 0 for pin in self.pins}
+
+    async def start(self):
+        # Build every driver once; the sensors only need the power-up settle time once
+        for pin in self.pins:
+            self._init_pin(pin)
+        await asyncio.sleep(1)
+        gc.collect()
+
+    def _init_pin(self, pin):
+        try:
+            self.sensors[pin] = self.driver(pin)
+            print(f"[SUCCESS]: Pin {pin} ready")
+            return True
+        except Exception as e:
+            self.sensors[pin] = None
+            print(f"[ERROR]: Pin {pin} init failed: {e}")
+            return False
+
+    def available(self):
+        # Pins that may be read this cycle; dead pins sit out until their backoff expires
+        now = time.ticks_ms()
+        ready = {}
+        for pin in self.pins:
+            retry_at = self.retry_at[pin]
+            if retry_at is not None:
+                if time.ticks_diff(retry_at, now) > 0:
+                    continue
+                self.retry_at[pin] = None
+                if self.sensors.get(pin) is None:
+                    self._init_pin(pin)
+            sensor = self.sensors.get(pin)
+            if sensor is None:
+                self._mark_dead(pin)
+                continue
+            ready[pin] = sensor
+        return ready
+
+    def report(self, pin, ok):
+        if ok:
+            if self.failures[pin] >= self.fail_threshold:
+                print(f"[INFO]: Pin {pin} recovered")
+            self.failures[pin] = 0
+            self.delay[pin] = 0
+            return
+        self.failures[pin] += 1
+        if self.failures[pin] == self.fail_threshold:
+            # Fresh Pin/driver objects clear a wedged one-wire line
+            print(f"[WARNING]: Pin {pin} failed {self.failures[pin]} reads, re-initialising")
+            self.reinits[pin] += 1
+            self._init_pin(pin)
+            self._mark_dead(pin)
+        elif self.failures[pin] > self.fail_threshold:
+            self._mark_dead(pin)
+
+    def _mark_dead(self, pin):
+        delay = self.delay[pin]
+        delay = self.backoff_ms if not delay else min(delay * 2, self.max_backoff_ms)
+        self.delay[pin] = delay
+        self.retry_at[pin] = time.ticks_add(time.ticks_ms(), delay)
+        print(f"[WARNING]: Pin {pin} backing off {delay // 1000}s")
+
+    def is_backing_off(self, pin):
+        return self.retry_at.get(pin) is not None
+
+    def health(self):
+        result = {}
+        for pin in self.pins:
+            failures = self.failures[pin]
+            if self.retry_at[pin] is not None:
+                state = "dead"
+            elif failures:
+                state = "failing"
+            else:
+                state = "ok"
+            result[pin] = dict(state=state, failures=failures, reinits=self.reinits[pin])
+        return result
@@ -0,0 +1,84 @@
+from array import array
+from SensorStats import TEMP, HUM
+
+_WIDTH = 8  # per key: temp count, sum, min, max, hum count, sum, min, max
+
+
+class Rollup_Tier:
+    def __init__(self, period, n_keys):
+        self.period = period
+        self.start = None
+        self.buf = array('f', [0.0] * (n_keys * _WIDTH))
+
+    def reset(self, start):
+        self.start = start
+        buf = self.buf
+        for i in range(len(buf)):
+            buf[i] = 0.0
+
+    def add(self, k, stats):
+        buf = self.buf
+        for ch, off in ((TEMP, k * _WIDTH), (HUM, k * _WIDTH + 4)):
+            n = stats.count(ch)
+            if not n:
+                continue
+            lo = stats.min(ch)
+            hi = stats.max(ch)
+            if not buf[off] or lo < buf[off + 2]:
+                buf[off + 2] = lo
+            if not buf[off] or hi > buf[off + 3]:
+                buf[off + 3] = hi
+            buf[off] += n
+            buf[off + 1] += stats.mean(ch) * n
+
+    def rows(self, keys):
+        out = []
+        buf = self.buf
+        for k, key in enumerate(keys):
+            off = k * _WIDTH
+            if not buf[off] and not buf[off + 4]:
+                continue
+            row = dict(pin=key)
+            for name, o in (('temp', off), ('hum', off + 4)):
+                n = int(buf[o])
+                row['n_' + name] = n
+                row['sum_' + name] = round(buf[o + 1], 2) if n else None
+                row['min_' + name] = round(buf[o + 2], 1) if n else None
+                row['max_' + name] = round(buf[o + 3], 1) if n else None
+            out.append(row)
+        return out
+
+
+class Sensor_Rollup:
+    def __init__(self, pins, periods=(60, 900, 3600), timezone_offset=0):
+        # Buckets are aligned to local wall-clock boundaries (e.g. :00/:15/:30/:45)
+        self.keys = list(pins) + ['OVERALL']
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.timezone_offset = timezone_offset
+        self.tiers = [Rollup_Tier(int(p), len(self.keys)) for p in periods]
+
+    def bucket_start(self, epoch, period):
+        return epoch - (epoch + self.timezone_offset) % period
+
+    def add(self, epoch, stats_by_pin):
+        # Feeds one cycle of raw-sample stats; returns the buckets this cycle closed as
+        # (period, start epoch, rows). OVERALL aggregates the samples of every pin.
+        closed = []
+        overall = self.index['OVERALL']
+        for tier in self.tiers:
+            start = self.bucket_start(epoch, tier.period)
+            if tier.start is None:
+                tier.reset(start)
+            elif start > tier.start:
+                rows = tier.rows(self.keys)
+                if rows:
+                    closed.append((tier.period, tier.start, rows))
+                tier.reset(start)
+            elif start < tier.start:
+                continue
+            for pin, stats in stats_by_pin.items():
+                k = self.index.get(pin)
+                if k is not None:
+                    tier.add(k, stats)
+                    tier.add(overall, stats)
+        return closed
@@ -0,0 +1,225 @@
+import time
+import gc
+from SensorStats import TEMP, HUM
+from SensorFilter import TEMP as F_TEMP, HUM as F_HUM
+
+DHT22_MIN_PERIOD_MS = 2000  # DHT22 allows one conversion per sensor every 2 s
+
+
+class Cycle_Clock:
+    # Deadline scheduler: cycles start on wall-clock boundaries once boundary_fn can tell
+    # them (on a ticks grid before that). Slots that already passed are skipped, never
+    # run back to back. Plain sync code so the asyncio loop and a thread can both use it.
+    def __init__(self, period_ms, boundary_fn=None):
+        self.period_ms = period_ms
+        self.boundary_fn = boundary_fn
+        self.next_cycle = None
+        self.stats = dict(period=period_ms // 1000, cycles=0, lateness_ms=0,
+                          max_lateness_ms=0, overruns=0, skipped=0)
+
+    def wait_ms(self):
+        # ms to sleep before the next cycle may start
+        period = self.period_ms
+        stats = self.stats
+        now = time.ticks_ms()
+        if self.next_cycle is not None:
+            late = time.ticks_diff(now, self.next_cycle)
+            if late > 0:
+                missed = late // period + 1
+                stats['overruns'] += 1
+                stats['skipped'] += missed
+                self.next_cycle = time.ticks_add(self.next_cycle, missed * period)
+                print(f"[WARNING]: Cycle overran by {late}ms, skipped {missed}")
+        boundary = self.boundary_fn(period, now) if self.boundary_fn else None
+        if boundary is not None:
+            # Follows clock corrections from each time sync
+            self.next_cycle = time.ticks_add(now, boundary)
+        elif self.next_cycle is None:
+            self.next_cycle = now
+        return max(time.ticks_diff(self.next_cycle, time.ticks_ms()), 0)
+
+    def set_period(self, period_ms):
+        # Live period change: the next cycle re-anchors on the new grid
+        self.period_ms = period_ms
+        self.stats['period'] = period_ms // 1000
+        self.next_cycle = None
+
+    def started(self):
+        stats = self.stats
+        lateness = max(time.ticks_diff(time.ticks_ms(), self.next_cycle), 0)
+        stats['cycles'] += 1
+        stats['lateness_ms'] = lateness
+        if lateness > stats['max_lateness_ms']:
+            stats['max_lateness_ms'] = lateness
+        self.next_cycle = time.ticks_add(self.next_cycle, self.period_ms)
+
+
+class Sensor_Sampler:
+    def __init__(self, pool, filters, sample_count=7, read_delay=2, spec=(-40, 100, 0, 100)):
+        self.pool = pool
+        self.filters = filters
+        self.sample_count = sample_count
+        self.read_delay = read_delay
+        self.min_temp_spec, self.max_temp_spec, self.min_hum_spec, self.max_hum_spec = spec
+        self.sample_rates = {}
+        self.last_read = {}  # pin: ticks_ms of its last read, carried across cycles
+
+    def read_sensor(self, sensor):
+        # measure() blocks for the whole DHT22 transfer; pacing is done by cycle()
+        try:
+            sensor.measure()
+            temp = sensor.temperature()
+            hum = sensor.humidity()
+            if not (self.min_temp_spec <= temp <= self.max_temp_spec):
+                temp = None
+            if not (self.min_hum_spec <= hum <= self.max_hum_spec):
+                hum = None
+            return temp, hum
+        except Exception:
+            return None, None
+
+    def cycle(self, sensor_pin, stats_by_pin, window):
+        # One sampling cycle as a generator of waits (ms): the caller sleeps for each
+        # yielded value, with asyncio or time.sleep_ms. Each pin is read once per `period`
+        # (never faster than the DHT22 allows), staggered evenly across that period.
+        # window receives the ticks_ms of the first and last good sample.
+        # Settings are read once so a live config change only affects the next cycle.
+        pins = list(sensor_pin)
+        sample_count = self.sample_count
+        n_pins = len(pins)
+        period = max(int(self.read_delay * 1000), DHT22_MIN_PERIOD_MS)
+        stagger = period // n_pins
+        start = time.ticks_ms()
+        due = [time.ticks_add(start, i * stagger) for i in range(n_pins)]
+        for i, pin in enumerate(pins):
+            # Back-to-back cycles: the stagger restarts, the per-sensor minimum doesn't
+            prev = self.last_read.get(pin)
+            if prev is not None:
+                earliest = time.ticks_add(prev, DHT22_MIN_PERIOD_MS)
+                if time.ticks_diff(earliest, due[i]) > 0:
+                    due[i] = earliest
+        reads = [0] * n_pins
+        ok_reads = [0] * n_pins
+        first = [None] * n_pins
+        last = [None] * n_pins
+        window[0] = window[1] = None
+        # Every pin starts empty, so one sitting out its backoff reports no data instead of
+        # repeating whatever its stats held from an earlier cycle (or ring slot)
+        for stats in stats_by_pin.values():
+            stats.reset()
+        remaining = n_pins * sample_count
+        while remaining:
+            now = time.ticks_ms()
+            idx = -1
+            wait = 0
+            for i in range(n_pins):
+                if reads[i] >= sample_count:
+                    continue
+                w = time.ticks_diff(due[i], now)
+                if idx < 0 or w < wait:
+                    idx, wait = i, w
+            yield max(wait, 0)
+
+            pin = pins[idx]
+            read_at = time.ticks_ms()
+            self.last_read[pin] = read_at
+            temp, hum = self.read_sensor(sensor_pin[pin])
+            reads[idx] += 1
+            remaining -= 1
+            # Late reads push the next slot out so a pin is never read twice within `period`
+            base = due[idx] if time.ticks_diff(read_at, due[idx]) <= 0 else read_at
+            due[idx] = time.ticks_add(base, period)
+            if first[idx] is None:
+                first[idx] = read_at
+            last[idx] = read_at
+
+            stats = stats_by_pin[pin]
+            ok = temp is not None or hum is not None
+            self.pool.report(pin, ok)
+            if ok:
+                ok_reads[idx] += 1
+                if window[0] is None:
+                    window[0] = read_at
+                window[1] = read_at
+            elif self.pool.is_backing_off(pin):
+                # Don't keep paying read timeouts on a pin that was just declared dead
+                remaining -= sample_count - reads[idx]
+                reads[idx] = sample_count
+            # Sensor health above is judged on the raw read; the filter only guards the stats
+            filt = self.filters[pin]
+            temp = filt.apply(F_TEMP, temp)
+            hum = filt.apply(F_HUM, hum)
+            if temp is not None:
+                stats.add(TEMP, temp)
+            if hum is not None:
+                stats.add(HUM, hum)
+
+        self.update_sample_rates(pins, ok_reads, reads, first, last, time.ticks_diff(time.ticks_ms(), start))
+        gc.collect()
+
+    def update_sample_rates(self, pins, ok_reads, reads, first, last, elapsed_ms):
+        rates = {}
+        for i, pin in enumerate(pins):
+            span = time.ticks_diff(last[i], first[i]) if reads[i] > 1 else 0
+            # Mean spacing between reads of this pin and good samples per minute of sampling
+            interval = round(span / (reads[i] - 1) / 1000, 2) if span else None
+            per_min = round(ok_reads[i] * 60000 / elapsed_ms, 1) if elapsed_ms > 0 else None
+            rejected = self.filters[pin].rejected
+            rates[pin] = dict(ok=ok_reads[i], reads=reads[i], interval=interval, per_min=per_min,
+                              rejected_temp=rejected[F_TEMP], rejected_hum=rejected[F_HUM])
+            print(f"[DEBUG]: Pin {pin} rate {per_min}/min ({ok_reads[i]}/{reads[i]} ok, every {interval}s, "
+                  f"rejected {rejected[F_TEMP]}/{rejected[F_HUM]})")
+        print(f"[DEBUG]: Sampling window {elapsed_ms / 1000}s for {len(pins)} pins")
+        self.sample_rates = rates
+
+    def collect_blocking(self, sensor_pin, stats_by_pin, window):
+        for wait in self.cycle(sensor_pin, stats_by_pin, window):
+            if wait:
+                time.sleep_ms(wait)
+        return stats_by_pin
+
+
+if __name__ == '__main__':
+    # Check with stubbed sensors on the unix port:  micropython SensorSampler.py
+    # Pin 26 gives one good read, then fails and backs off; the next cycle must not
+    # count that old read again in its stats or in the rollup.
+    import uasyncio as asyncio
+    from SensorPool import Sensor_Pool
+    from SensorFilter import Sample_Filter
+    from SensorStats import Running_Stats, summarize
+    from SensorRollup import Sensor_Rollup
+
+    class Stub_DHT22:
+        def __init__(self, pin):
+            self.pin = pin
+            self.reads = 0
+
+        def measure(self):
+            self.reads += 1
+            if self.pin == 26 and self.reads > 1:
+                raise OSError("timeout")
+
+        def temperature(self):
+            return 20.0 + self.pin % 10
+
+        def humidity(self):
+            return 50.0
+
+    pins = [25, 26]
+    pool = Sensor_Pool(pins, driver=Stub_DHT22, fail_threshold=1)
+    asyncio.run(pool.start())
+    sampler = Sensor_Sampler(pool, {p: Sample_Filter('none') for p in pins}, sample_count=2)
+    stats = {p: Running_Stats() for p in pins}
+    rollup = Sensor_Rollup(pins, periods=[3600])
+    for cycle in range(2):
+        available = pool.available()
+        sampler.collect_blocking(available, stats, [None, None])
+        per_sensor, overall, result = summarize(stats)
+        rollup.add(0, stats)
+        print(f"[INFO]: Cycle {cycle + 1} pins {sorted(available)} per_sensor {per_sensor}")
+    assert 26 not in available, "pin 26 should be backing off"
+    assert per_sensor[26]['temp'] is None, per_sensor[26]
+    assert overall['Temperature'] == 25.0, overall
+    counts = {row['pin']: row['n_temp'] for row in rollup.tiers[0].rows(rollup.keys)}
+    assert counts == {25: 4, 26: 1, 'OVERALL': 5}, counts
+    print("[SUCCESS]: Backed-off pin left out of the cycle")
@@ -0,0 +1,92 @@
+from array import array
+from math import sqrt
+
+TEMP = 0
+HUM = 5
+_WIDTH = 10  # per channel: count, mean, m2, min, max
+
+
+class Running_Stats:
+    __slots__ = ('buf',)
+
+    def __init__(self):
+        self.buf = array('f', [0.0] * _WIDTH)
+
+    def reset(self):
+        buf = self.buf
+        for i in range(_WIDTH):
+            buf[i] = 0.0
+
+    def add(self, ch, x):
+        # Welford update; min/max are seeded by the first sample
+        buf = self.buf
+        n = buf[ch] + 1
+        buf[ch] = n
+        delta = x - buf[ch + 1]
+        buf[ch + 1] += delta / n
+        buf[ch + 2] += delta * (x - buf[ch + 1])
+        if n == 1 or x < buf[ch + 3]:
+            buf[ch + 3] = x
+        if n == 1 or x > buf[ch + 4]:
+            buf[ch + 4] = x
+
+    def count(self, ch):
+        return int(self.buf[ch])
+
+    def mean(self, ch):
+        return self.buf[ch + 1] if self.buf[ch] else None
+
+    def std(self, ch):
+        n = self.buf[ch]
+        return sqrt(max(self.buf[ch + 2], 0.0) / n) if n else None
+
+    def min(self, ch):
+        return self.buf[ch + 3] if self.buf[ch] else None
+
+    def max(self, ch):
+        return self.buf[ch + 4] if self.buf[ch] else None
+
+
+def _r(value, digits=1):
+    return None if value is None else round(value, digits)
+
+
+def summarize(stats_by_pin):
+    # One pass over the pins: per-pin rows plus the pooled (Chan et al.) overall
+    # mean/std and the min/max of the per-pin averages.
+    per_sensor = {}
+    pooled = [0.0] * 6  # temp n, mean, m2, hum n, mean, m2
+    spread = [None] * 4  # temp max, temp min, hum max, hum min (of pin averages)
+    for pin, stats in stats_by_pin.items():
+        row = dict(
+            temp=_r(stats.mean(TEMP)), hum=_r(stats.mean(HUM)),
+            temp_max=_r(stats.max(TEMP)), temp_min=_r(stats.min(TEMP)),
+            hum_max=_r(stats.max(HUM)), hum_min=_r(stats.min(HUM)),
+            temp_std=_r(stats.std(TEMP), 2), hum_std=_r(stats.std(HUM), 2)
+        )
+        per_sensor[pin] = row
+        for ch, off, avg, s in ((TEMP, 0, row['temp'], 0), (HUM, 3, row['hum'], 2)):
+            n_b = stats.count(ch)
+            if not n_b:
+                continue
+            buf = stats.buf
+            n_a = pooled[off]
+            n = n_a + n_b
+            delta = buf[ch + 1] - pooled[off + 1]
+            pooled[off + 1] += delta * n_b / n
+            pooled[off + 2] += buf[ch + 2] + delta * delta * n_a * n_b / n
+            pooled[off] = n
+            spread[s] = avg if spread[s] is None else max(spread[s], avg)
+            spread[s + 1] = avg if spread[s + 1] is None else min(spread[s + 1], avg)
+
+    overall = dict(
+        Temperature=_r(pooled[1]) if pooled[0] else None,
+        Humidity=_r(pooled[4]) if pooled[3] else None
+    )
+    result = dict(
+        Temperature=dict(max=spread[0], min=spread[1],
+                         std=_r(sqrt(pooled[2] / pooled[0]), 2) if pooled[0] else None),
+        Humidity=dict(max=spread[2], min=spread[3],
+                      std=_r(sqrt(pooled[5] / pooled[3]), 2) if pooled[3] else None)
+    )
+    return per_sensor, overall, result
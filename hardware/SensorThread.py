@@ -0,0 +1,143 @@
+import _thread
+import time
+import gc
+import uasyncio as asyncio
+from SensorStats import Running_Stats
+
+
+class Cycle_Ring:
+    # Single producer (sampling thread) / single consumer (asyncio) ring of finished cycles.
+    # Slots are preallocated; only `head` is written by the producer and `tail` by the consumer.
+    def __init__(self, pins, slots=3):
+        self.slots = [({pin: Running_Stats() for pin in pins}, [None, None]) for _ in range(max(int(slots), 2))]
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+        self.flag = asyncio.ThreadSafeFlag()
+
+    def writable(self):
+        # Slot the producer may fill, or None when the consumer is behind
+        if self.head - self.tail >= len(self.slots):
+            return None
+        return self.slots[self.head % len(self.slots)]
+
+    def commit(self):
+        self.head += 1
+        self.flag.set()
+
+    def peek(self):
+        if self.tail == self.head:
+            return None
+        return self.slots[self.tail % len(self.slots)]
+
+    def release(self):
+        self.tail += 1
+
+
+class Sampling_Thread:
+    # Runs DHT22 sampling on its own thread so a stalled asyncio loop (HTTP time sync,
+    # flash writes, socket waits) can't push reads around. Finished cycles go through the ring.
+    def __init__(self, pool, sampler, clock=None, interval=2, slots=3, stack_size=8192):
+        # clock: a SensorSampler.Cycle_Clock, or None to sleep `interval` s between cycles
+        self.pool = pool
+        self.sampler = sampler
+        self.clock = clock
+        self.interval = interval
+        self.ring = Cycle_Ring(pool.pins, slots)
+        self.stack_size = stack_size
+        self.running = False
+
+    def start(self):
+        self.running = True
+        try:
+            _thread.stack_size(self.stack_size)
+        except Exception:
+            pass
+        _thread.start_new_thread(self._run, ())
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        ring = self.ring
+        while self.running:
+            try:
+                if self.clock:
+                    wait = self.clock.wait_ms()
+                    if wait:
+                        time.sleep_ms(wait)
+                    self.clock.started()
+                pins = self.pool.available()
+                if not pins:
+                    print("[ERROR]: No sensor available")
+                    time.sleep(self.interval * 5)
+                    continue
+                slot = ring.writable()
+                if slot is None:
+                    # Consumer is behind: drop this cycle rather than overwrite one in use
+                    ring.dropped += 1
+                    print("[WARNING]: Sampling ring full, cycle dropped")
+                    time.sleep(self.interval)
+                    continue
+                stats, window = slot
+                self.sampler.collect_blocking(pins, stats, window)
+                ring.commit()
+            except Exception as e:
+                print(f"[ERROR]: Sampling thread failed: {e}")
+                gc.collect()
+            if not self.clock:
+                time.sleep(self.interval)
+
+
+if __name__ == '__main__':
+    # Unix port demo with stubbed sensors:  micropython SensorThread.py
+    # The asyncio side blocks for 1.5 s every cycle; the sample spacing stays on schedule.
+    import random
+    from SensorPool import Sensor_Pool
+    from SensorFilter import Sample_Filter
+    from SensorSampler import Sensor_Sampler, Cycle_Clock
+    from SensorStats import summarize
+
+    class Stub_DHT22:
+        def __init__(self, pin):
+            self.pin = pin
+
+        def measure(self):
+            time.sleep_ms(25)
+            if random.getrandbits(4) == 0:
+                raise OSError("timeout")
+
+        def temperature(self):
+            return 24 + self.pin % 4 + random.getrandbits(4) / 10
+
+        def humidity(self):
+            return 55 + random.getrandbits(5) / 10
+
+    pins = [25, 26, 32, 33]
+    pool = Sensor_Pool(pins, driver=Stub_DHT22)
+    asyncio.run(pool.start())
+    sampler = Sensor_Sampler(pool, {p: Sample_Filter('mad') for p in pins}, sample_count=3, read_delay=2)
+    worker = Sampling_Thread(pool, sampler, Cycle_Clock(10000))
+
+    async def consume(cycles):
+        ring = worker.ring
+        done = 0
+        while done < cycles:
+            await ring.flag.wait()
+            while True:
+                slot = ring.peek()
+                if slot is None:
+                    break
+                stats, window = slot
+                per_sensor, overall, result = summarize(stats)
+                span = time.ticks_diff(window[1], window[0]) if window[0] is not None else None
+                ring.release()
+                done += 1
+                print(f"[INFO]: Cycle {done} window {span}ms overall {overall}")
+                print(f"[INFO]: Rates {sampler.sample_rates}")
+                time.sleep_ms(1500)  # stand-in for a blocking call on the asyncio loop
+        worker.stop()
+        print(f"[INFO]: Clock {worker.clock.stats}, dropped {ring.dropped}")
+
+    worker.start()
+    asyncio.run(consume(3))
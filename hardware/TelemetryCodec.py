@@ -0,0 +1,102 @@
+# Packed DHT22 telemetry shared by the device (MicroPython) and the ingest side (CPython).
+#
+# Message (big-endian):
+#   header  B version | 6s MAC | I epoch seconds (UTC) | B row count
+#   row     B pin (0xFF = OVERALL) | 8 x h VALUE_KEYS as hundredths, -32768 = null
+#           | H rows held back by the deadband since the previous one
+#
+# JSON payloads on the same topic always start with '{' (0x7B), never a version byte.
+#
+# Host usage:
+#   mosquitto_sub -t 'esp32/+/dht' -F %x | python3 TelemetryCodec.py
+import struct
+
+VERSION = 1
+VALUE_KEYS = ('avg_temp', 'avg_hum', 'max_temp', 'min_temp', 'max_hum', 'min_hum', 'std_temp', 'std_hum')
+OVERALL_PIN = 0xFF
+SCALE = 100  # values travel as int16 hundredths
+NONE_VALUE = -32768
+
+HEADER_FMT = '>B6sIB'
+ROW_FMT = '>B8hH'
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+ROW_SIZE = struct.calcsize(ROW_FMT)
+
+
+def to_fixed(value):
+    if value is None:
+        return NONE_VALUE
+    v = int(round(value * SCALE))
+    return -32767 if v < -32767 else (32767 if v > 32767 else v)
+
+
+def from_fixed(value):
+    return None if value == NONE_VALUE else value / SCALE
+
+
+def to_count(value):
+    return 0 if not value else (value if value < 0xFFFF else 0xFFFF)
+
+
+def encoded_size(n_rows):
+    return HEADER_SIZE + n_rows * ROW_SIZE
+
+
+def encode_into(buf, mac, epoch, rows):
+    # mac: 6 raw bytes. Returns the number of bytes written to buf.
+    struct.pack_into(HEADER_FMT, buf, 0, VERSION, mac, epoch, len(rows))
+    offs = HEADER_SIZE
+    for row in rows:
+        pin = row['pin']
+        struct.pack_into(
+            ROW_FMT, buf, offs, OVERALL_PIN if pin == 'OVERALL' else pin,
+            to_fixed(row['avg_temp']), to_fixed(row['avg_hum']),
+            to_fixed(row['max_temp']), to_fixed(row['min_temp']),
+            to_fixed(row['max_hum']), to_fixed(row['min_hum']),
+            to_fixed(row['std_temp']), to_fixed(row['std_hum']),
+            to_count(row.get('suppressed'))
+        )
+        offs += ROW_SIZE
+    return offs
+
+
+def is_binary(payload):
+    return len(payload) > 0 and payload[0] == VERSION
+
+
+def decode(payload):
+    # Returns the rows in the same shape as the JSON messages, with an epoch timestamp
+    if len(payload) < HEADER_SIZE:
+        raise ValueError("short payload")
+    version, mac, epoch, count = struct.unpack_from(HEADER_FMT, payload, 0)
+    if version != VERSION:
+        raise ValueError("unsupported version %d" % version)
+    if len(payload) < encoded_size(count):
+        raise ValueError("truncated payload")
+    mac = ':'.join('%02X' % b for b in mac)
+    rows = []
+    offs = HEADER_SIZE
+    for _ in range(count):
+        fields = struct.unpack_from(ROW_FMT, payload, offs)
+        row = {'mac': mac, 'pin': 'OVERALL' if fields[0] == OVERALL_PIN else fields[0], 'timestamp': epoch}
+        for key, value in zip(VALUE_KEYS, fields[1:9]):
+            row[key] = from_fixed(value)
+        if fields[9]:
+            row['suppressed'] = fields[9]  # As in the JSON rows: only present when non-zero
+        rows.append(row)
+        offs += ROW_SIZE
+    return rows
+
+
+if __name__ == '__main__':
+    import sys
+    import json
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            for row in decode(bytes.fromhex(line)):
+                print(json.dumps(row))
+        except ValueError as e:
+            print("[ERROR]: %s" % e, file=sys.stderr)
@@ -7,6 +7,8 @@ import machine
 
 
 class Time_Manager:
+    # Seconds between 1970-01-01 and the port's time() epoch (2000-01-01 on older ESP32 builds)
+    EPOCH_OFFSET = 946684800 if time.gmtime(0)[0] == 2000 else 0
     ISO_RE = ure.compile(r"^(\d{4})-(\d{2})-(\d{2})T"r"(\d{2}):(\d{2}):(\d{2})"r"(?:\.\d+)?Z?$")
     
     def __init__(
@@ -21,6 +23,9 @@ class Time_Manager:
         self.ntp_sync = False
         self.sync_iso = None
         self.sync_ticks = None
+        self.sync_epoch = None  # Unix seconds (UTC) at sync_ticks
+        self._iso_day = None
+        self._iso_prefix = None
         self.boot_ticks = time.ticks_ms()
         
         gc.collect()
@@ -43,15 +48,6 @@ class Time_Manager:
         except:
             return None
 
-    def iso_add_ms(self, iso_anchor, delta_ms):
-        t = self.parse_iso(iso_anchor)
-        if not t:
-            return self.now()
-        y, m, d, H, M, S = t
-        sec = time.mktime((y, m, d, H, M, S, 0, 0))
-        sec += delta_ms // 1000
-        y2, m2, d2, H2, M2, S2, _, _ = time.localtime(sec + self.timezone_offset)
-        return f"{y2:04d}-{m2:02d}-{d2:02d}T{H2:02d}:{M2:02d}:{S2:02d}"
     async def sync_http_time(self):
         if not self.ethernet.isconnected():
             print("[TIME]: Ethernet not connected → skip HTTP time sync")
@@ -74,6 +70,7 @@ class Time_Manager:
             rtc.datetime((y_th, mo_th, d_th, 0, hh_th, mm_th, ss_th, 0))
             self.sync_iso = iso
             self.sync_ticks = time.ticks_ms()
+            self.sync_epoch = utc_time + self.EPOCH_OFFSET
             self.ntp_sync = True
             print("[INFO]: HTTP time synced @", self.sync_iso)
             gc.collect()
@@ -114,6 +111,38 @@ class Time_Manager:
         gc.collect()
         return f"{y:04d}-{mo:02d}-{d:02d}T{hh:02d}:{mm:02d}:{ss:02d}"
 
+    def epoch_at(self, ticks):
+        # Unix seconds (UTC) for a ticks_ms value, from the last sync anchor; None before the first sync
+        if self.sync_ticks is None:
+            return None
+        return self.sync_epoch + time.ticks_diff(ticks, self.sync_ticks) // 1000
+
+    def epoch(self):
+        now = self.epoch_at(time.ticks_ms())
+        if now is None:
+            # Unsynced: fall back to the RTC, which is kept in local time
+            now = time.time() - self.timezone_offset + self.EPOCH_OFFSET
+        return now
+
+    def ms_to_boundary(self, period_ms, ticks):
+        # ms from `ticks` to the next local wall-clock multiple of period_ms (period should divide a day);
+        # 0 when `ticks` is on one, so that cycle runs instead of waiting a whole period
+        if self.sync_ticks is None:
+            return None
+        local_ms = (self.sync_epoch + self.timezone_offset) % 86400 * 1000 + time.ticks_diff(ticks, self.sync_ticks)
+        return -local_ms % period_ms
+
+    def format_iso(self, epoch):
+        # Local-time ISO string like now(); the date part is only rebuilt when the day changes
+        local = epoch + self.timezone_offset
+        day = local // 86400
+        if day != self._iso_day:
+            y, m, d, *_ = time.localtime(day * 86400 - self.EPOCH_OFFSET)
+            self._iso_prefix = f"{y:04d}-{m:02d}-{d:02d}T"
+            self._iso_day = day
+        sec = local - day * 86400
+        return f"{self._iso_prefix}{sec // 3600:02d}:{sec // 60 % 60:02d}:{sec % 60:02d}"
+
     def uptime(self):
         up = time.ticks_diff(time.ticks_ms(), self.boot_ticks) / 1000
         gc.collect()
@@ -0,0 +1,74 @@
+import ujson
+import uasyncio as asyncio
+
+
+class Topic_Dispatcher:
+    # Routes inbound messages by MQTT topic filter ('+' one level, '#' all remaining levels).
+    # Filters are compiled once at registration: exact topics become a dict lookup, wildcard
+    # filters a tuple of levels compared against the split topic. JSON is only decoded when
+    # a matching handler asks for it, and then once for all of them.
+    def __init__(self):
+        self.exact = {}  # topic: [route]
+        self.wild = []   # [(levels, route)]
+
+    def register(self, topic_filter, handler, command=None, parse=True, timeout=None):
+        # handler(topic, data, args) is a coroutine. data is the decoded JSON object (the raw
+        # bytes with parse=False); args holds the topic levels matched by the wildcards.
+        # With command set, the handler only runs when data["command"] equals it.
+        # timeout (s): the handler is cancelled past it and dispatch raises asyncio.TimeoutError.
+        route = (handler, command, parse or command is not None, timeout)
+        if '+' in topic_filter or '#' in topic_filter:
+            self.wild.append((tuple(topic_filter.split('/')), route))
+        else:
+            self.exact.setdefault(topic_filter, []).append(route)
+
+    @staticmethod
+    def _match(levels, parts):
+        # Wildcard captures if the split topic `parts` matches the filter `levels`, else None
+        args = []
+        for i, level in enumerate(levels):
+            if level == '#':
+                args.append('/'.join(parts[i:]))
+                return args
+            if i >= len(parts):
+                return None
+            if level == '+':
+                args.append(parts[i])
+            elif level != parts[i]:
+                return None
+        return args if len(levels) == len(parts) else None
+
+    def matches(self, topic):
+        found = [(route, ()) for route in self.exact.get(topic, ())]
+        if self.wild:
+            parts = topic.split('/')
+            for levels, route in self.wild:
+                args = self._match(levels, parts)
+                if args is not None:
+                    found.append((route, args))
+        return found
+
+    async def dispatch(self, topic, msg):
+        # Returns how many handlers ran
+        if not isinstance(topic, str):
+            topic = topic.decode('utf-8')
+        data = None
+        ran = 0
+        for (handler, command, parse, timeout), args in self.matches(topic):
+            if parse and data is None:
+                try:
+                    data = ujson.loads(msg.decode('utf-8')) if msg else {}
+                except Exception:
+                    data = {}
+                if not isinstance(data, dict):
+                    data = {}
+            if command is not None and data.get('command') != command:
+                continue
+            if timeout:
+                await asyncio.wait_for(handler(topic, data if parse else msg, args), timeout)
+            else:
+                await handler(topic, data if parse else msg, args)
+            ran += 1
+        if not ran:
+            print(f"[DEBUG]: No handler for '{topic}'")
+        return ran
@@ -31,11 +31,13 @@ async def main():
         time_manager=time_mgr
     )
     dht_mgr.mqtt_manager = mqtt_mgr
+    mqtt_mgr.display_manager = display_mgr
     asyncio.create_task(ethernet.check_reset_config(mqtt_manager=mqtt_mgr, dht22_manager=dht_mgr))
     asyncio.create_task(ethernet.led_status_manager())
     asyncio.create_task(ethernet.retry_connect_loop())
     asyncio.create_task(mqtt_mgr.start_service_mqtt())
     asyncio.create_task(display_mgr.start_service_display())
+    asyncio.create_task(dht_mgr.start_service_backlog_drain())
     await dht_mgr.start_service_dht22()
 
 
@@ -22,7 +22,13 @@ from errno import EINPROGRESS, ETIMEDOUT
 
 gc.collect()
 from micropython import const
-from machine import unique_id
+try:
+    from machine import unique_id
+except ImportError:  # e.g. unix port
+    from os import urandom
+
+    def unique_id():
+        return urandom(6)
 # import network # REMOVED: No longer needed
 
 gc.collect()
@@ -32,6 +38,11 @@ VERSION = (0, 8, 4)
 # Default initial size for input messge buffer. Increase this if large messages
 # are expected, but rarely, to avoid big runtime allocations
 IBUFSIZE = 50
+# Initial size of the transmit buffer PUBLISH packets are assembled in. It grows to the
+# largest packet sent.
+TBUFSIZE = 256
+# Encoded topics kept for reuse by publish()
+TOPIC_CACHE = 8
 # By default the callback interface returns and incoming message as bytes.
 # For performance reasons with large messages it may return a memoryview.
 MSG_BYTES = True
@@ -99,6 +110,8 @@ config = {
     "clean_init": True,
     "clean": True,
     "max_repubs": 4,
+    "max_inflight": 8,  # QoS1 publishes that may await PUBACK at the same time
+    "rx_mode": "stream",  # "stream": sleep until the socket is ready. "poll": 5 ms polling loop
     "will": None,
     "subs_cb": lambda *_: None,
     "connect_coro": eliza,
@@ -203,10 +216,31 @@ class MQTT_base:
 
         self.newpid = pid_gen()
         self.rcv_pids = set()  # PUBACK and SUBACK pids awaiting ACK response
+        # In-flight window for QoS1 publishes. Each one waits on its own Event, which
+        # kill_pid sets when the PUBACK arrives, and handles its own retransmission.
+        self.max_inflight = max(config.get("max_inflight", 1), 1)
+        self._window = self.max_inflight  # Capped by the broker's Receive Maximum (V5)
+        self._receive_max = 0  # Receive Maximum from the last CONNACK (0 = none)
+        self._inflight = 0
+        self._window_free = asyncio.Event()
+        self._acks = {}  # pid: Event
         self.last_rx = ticks_ms()  # Time of last communication from broker
         self.lock = asyncio.Lock()
         self._ibuf = bytearray(IBUFSIZE)
         self._mvbuf = memoryview(self._ibuf)
+        self._rbuf = bytearray(max(IBUFSIZE, 256))  # Receive buffer after CONNACK
+        self._rmv = memoryview(self._rbuf)
+        self._rx_reset()
+        self._tbuf = bytearray(TBUFSIZE)  # Outgoing PUBLISH, written with a single write
+        self._tmv = memoryview(self._tbuf)
+        self._topics = {}  # topic: length-prefixed UTF-8 bytes
+        self._ackpkt = bytearray(b"\x40\x02\0\0")  # Outgoing PUBACK
+
+        # Readiness waits use the asyncio IO queue directly, as asyncio's own Stream does.
+        # Ports without it fall back to polling.
+        core = getattr(asyncio, "core", None)
+        self._rx_stream = config.get("rx_mode", "stream") == "stream" and hasattr(core, "_io_queue")
+        self.rx_wakeups = 0  # Receive loop iterations, for comparing rx modes
 
         self.mqttv5 = config.get("mqttv5")
         self.mqttv5_con_props = config.get("mqttv5_con_props")
@@ -229,9 +263,29 @@ class MQTT_base:
         if self.DEBUG:
             print(msg % args)
 
+    def _set_window(self):
+        self._window = min(self.max_inflight, self._receive_max) if self._receive_max else self.max_inflight
+        self._window_free.set()  # Publishers held by a smaller window re-check it
+
     def _timeout(self, t):
         return ticks_diff(ticks_ms(), t) > self._response_time
 
+    # Park the task until sock is readable. A generator-based coro, as in asyncio.Stream:
+    # the scheduler resumes it from its poll() call, no timer wakeups. A closed socket
+    # (reconnect) wakes it, a link that just goes quiet does not.
+    async def _io_wait(self, sock):
+        yield asyncio.core._io_queue.queue_read(sock)
+
+    # As above, but gives up once ms have passed. Cancelling on expiry drops the socket
+    # from the IO queue, which is safe only because the receive path is its one reader
+    # (writes never queue on it).
+    async def _io_wait_ms(self, sock, ms):
+        try:
+            await asyncio.wait_for_ms(self._io_wait(sock), max(ms, 1))
+        except asyncio.TimeoutError:
+            raise OSError(-1, "Timeout on socket read")
+
+    # Only used while connecting (CONNACK); after that packets come in through ._rbuf.
     async def _as_read(self, n, sock=None):  # OSError caught by superclass
         if sock is None:
             sock = self._sock
@@ -297,6 +351,9 @@ class MQTT_base:
 
     async def _connect(self, clean):
         mqttv5 = self.mqttv5  # Cache local
+        self._receive_max = 0
+        self._window = self.max_inflight
+        self._rx_reset()
         self._sock = socket.socket()
         self._sock.setblocking(False)
         try:
@@ -389,6 +446,8 @@ class MQTT_base:
             decoded_props = decode_properties(connack_props, connack_props_length)
             #self.dprint("CONNACK properties: %s", decoded_props)
             self.topic_alias_maximum = decoded_props.get(0x22, 0)
+            self._receive_max = decoded_props.get(0x21, 0)
+            self._set_window()
 
     async def _ping(self):
         async with self.lock:
@@ -461,44 +520,80 @@ class MQTT_base:
         #     self.dprint("Wi-Fi not started, unable to disconnect interface")
         # self._sta_if.active(False) # REMOVED
 
-    async def _await_pid(self, pid):
-        t = ticks_ms()
-        while pid in self.rcv_pids:  # local copy
-            if self._timeout(t) or not self.isconnected():
-                break  # Must repub or bail out
-            await asyncio.sleep_ms(100)
-        else:
-            return True  # PID received. All done.
-        return False
+    # PUBACK/SUBACK/UNSUBACK waiters. kill_pid sets the pid's Event as soon as wait_msg
+    # parses the ACK, so completion costs one network round trip rather than a poll period.
+    def _expect(self, pid):
+        evt = asyncio.Event()
+        self._acks[pid] = evt
+        self.rcv_pids.add(pid)
+        return evt
+
+    async def _await_pid(self, pid, evt):
+        # True once the ACK arrived; False on timeout or lost connection (must repub or bail out)
+        try:
+            await asyncio.wait_for_ms(evt.wait(), self._response_time)
+        except asyncio.TimeoutError:
+            pass
+        return pid not in self._acks  # Removed by kill_pid only
 
-    # qos == 1: coro blocks until wait_msg gets correct PID.
+    def _wake_acks(self):  # Connection lost: waiters re-check and bail out
+        for evt in self._acks.values():
+            evt.set()
+
+    # qos == 1: coro blocks until wait_msg gets correct PID. Up to ._window
+    # such coros may be in flight at once; further ones wait for a free slot.
     # If WiFi fails completely subclass re-publishes with new PID.
     async def publish(self, topic, msg, retain, qos, properties=None):
-        pid = next(self.newpid)
-        if qos:
-            self.rcv_pids.add(pid)
-        async with self.lock:
-            await self._publish(topic, msg, retain, qos, 0, pid, properties)
         if qos == 0:
+            async with self.lock:
+                await self._publish(topic, msg, retain, qos, 0, next(self.newpid), properties)
             return
 
-        count = 0
-        while 1:  # Await PUBACK, republish on timeout
-            if await self._await_pid(pid):
-                return
-            # No match
-            if count >= self._max_repubs or not self.isconnected():
-                raise OSError(-1)  # Subclass to re-publish with new PID
+        while self._inflight >= self._window:
+            self._window_free.clear()
+            await self._window_free.wait()
+        self._inflight += 1
+        pid = next(self.newpid)
+        evt = self._expect(pid)
+        try:
             async with self.lock:
-                # Add pid
-                await self._publish(topic, msg, retain, qos, dup=1, pid=pid, properties=properties)
-            count += 1
-            self.REPUB_COUNT += 1
-
+                await self._publish(topic, msg, retain, qos, 0, pid, properties)
+            count = 0
+            while 1:  # Await PUBACK, republish on timeout
+                if await self._await_pid(pid, evt):
+                    return
+                # No match
+                if count >= self._max_repubs or not self.isconnected():
+                    raise OSError(-1)  # Subclass to re-publish with new PID
+                evt.clear()
+                self.rcv_pids.add(pid)  # May have been cleared by a reconnect
+                async with self.lock:
+                    await self._publish(topic, msg, retain, qos, dup=1, pid=pid, properties=properties)
+                count += 1
+                self.REPUB_COUNT += 1
+        finally:
+            self._acks.pop(pid, None)
+            self.rcv_pids.discard(pid)
+            self._inflight -= 1
+            self._window_free.set()
+
+    def _topic(self, topic):
+        t = self._topics.get(topic)
+        if t is None:
+            raw = topic.encode() if isinstance(topic, str) else topic
+            t = struct.pack("!H", len(raw)) + raw
+            if len(self._topics) >= TOPIC_CACHE:
+                self._topics.clear()
+            self._topics[topic] = t
+        return t
+
+    # The whole packet is assembled in ._tbuf and sent with one write: one syscall and
+    # no small leading TCP segments held back by Nagle. Called with the lock held.
     async def _publish(self, topic, msg, retain, qos, dup, pid, properties=None):
-        pkt = bytearray(b"\x30\0\0\0")
-        pkt[0] |= qos << 1 | retain | dup << 3
-        sz = 2 + len(topic) + len(msg)
+        topic = self._topic(topic)
+        if isinstance(msg, str):
+            msg = msg.encode()  # len() must count bytes, not characters
+        sz = len(topic) + len(msg)
         if qos > 0:
             sz += 2
 
@@ -506,14 +601,23 @@ class MQTT_base:
             properties = encode_properties(properties)
             sz += len(properties)
 
-        await self._as_write(pkt, vbi(pkt, 1, sz))  # Encode size as VBI
-        await self._send_str(topic)
+        if sz + 5 > len(self._tbuf):
+            self._tbuf = bytearray(sz + 5 + 64)
+            self._tmv = memoryview(self._tbuf)
+        buf = self._tbuf
+        mv = self._tmv
+        buf[0] = 0x30 | qos << 1 | retain | dup << 3
+        offs = vbi(buf, 1, sz)  # Encode size as VBI
+        mv[offs:offs + len(topic)] = topic
+        offs += len(topic)
         if qos > 0:
-            struct.pack_into("!H", pkt, 0, pid)
-            await self._as_write(pkt, 2)
+            struct.pack_into("!H", buf, offs, pid)
+            offs += 2
         if self.mqttv5:
-            await self._as_write(properties)
-        await self._as_write(msg)
+            mv[offs:offs + len(properties)] = properties
+            offs += len(properties)
+        mv[offs:offs + len(msg)] = msg
+        await self._as_write(buf, offs + len(msg))
 
     async def subscribe(self, topic, qos, properties=None):
         await self._usub(topic, qos, properties)
@@ -525,154 +629,202 @@ class MQTT_base:
     # Can raise OSError if WiFi fails. Subclass traps. # Changed: No longer referring to Wi-Fi
     async def _usub(self, topic, qos, properties):
         sub = qos is not None
-        pkt = bytearray(7)
-        pkt[0] = 0x82 if sub else 0xA2
+        topic = topic.encode() if isinstance(topic, str) else topic
         pid = next(self.newpid)
-        self.rcv_pids.add(pid)
         # 2 bytes of PID + 2 bytes of topic length + len(topic)
         sz = 2 + 2 + len(topic) + (1 if sub else 0)
         if self.mqttv5:
             # Return length as VBI followed by properties or b'\0'
             properties = encode_properties(properties)
             sz += len(properties)
+        # One buffer, one write: see _publish
+        pkt = bytearray(sz + 5)
+        pkt[0] = 0x82 if sub else 0xA2
         offs = vbi(pkt, 1, sz)  # Store size as variable byte integer
         struct.pack_into("!H", pkt, offs, pid)
-
-        async with self.lock:
-            await self._as_write(pkt, offs + 2)
-            if self.mqttv5:
-                await self._as_write(properties)
-            await self._send_str(topic)
-            if sub:
-                # Only QoS is supported other features such as:
-                # (NL) No Local, (RAP) Retain As Published and Retain Handling.
-                # Are not supported.
-                await self._as_write(qos.to_bytes(1, "little"))
-
-        if not await self._await_pid(pid):
-            raise OSError(-1)
+        offs += 2
+        if self.mqttv5:
+            pkt[offs:offs + len(properties)] = properties
+            offs += len(properties)
+        struct.pack_into("!H", pkt, offs, len(topic))
+        offs += 2
+        pkt[offs:offs + len(topic)] = topic
+        offs += len(topic)
+        if sub:
+            # Only QoS is supported other features such as:
+            # (NL) No Local, (RAP) Retain As Published and Retain Handling.
+            # Are not supported.
+            pkt[offs] = qos
+            offs += 1
+
+        evt = self._expect(pid)
+        try:
+            async with self.lock:
+                await self._as_write(pkt, offs)
+            if not await self._await_pid(pid, evt):
+                raise OSError(-1)
+        finally:
+            self._acks.pop(pid, None)
+            self.rcv_pids.discard(pid)
 
     # Remove a pending pid after a successful receive.
     def kill_pid(self, pid, msg):
         if pid in self.rcv_pids:
             self.rcv_pids.discard(pid)
+            evt = self._acks.pop(pid, None)
+            if evt is not None:
+                evt.set()
         else:
             raise OSError(-1, f"Invalid pid in {msg} packet")
 
-    # Wait for a single incoming MQTT message and process it.
+    # Receive side. Bytes are pulled into ._rbuf in whatever chunks the socket has and
+    # complete packets are parsed straight out of it, so a burst of small packets (e.g.
+    # PUBACKs during a backlog drain) costs one read and no per-field coroutine calls.
+    def _rx_reset(self):
+        self._rpos = 0  # Start of the first unparsed packet
+        self._rlen = 0  # End of valid data
+        self._rneed = 0  # Size of the partial packet at ._rpos, once known
+
+    def _rx_fill(self):  # Returns the number of bytes added (0 if none available)
+        buf = self._rbuf
+        if self._rpos == self._rlen:
+            self._rpos = self._rlen = 0
+        elif self._rlen == len(buf) or self._rneed > len(buf) - self._rpos:
+            n = self._rlen - self._rpos  # Move the partial packet to the front, grow if needed
+            if self._rpos:
+                buf[:n] = bytes(self._rmv[self._rpos:self._rlen])
+                self._rpos = 0
+                self._rlen = n
+            if self._rneed > len(buf) or n == len(buf):
+                self._rmv = None
+                buf.extend(bytearray(max(self._rneed - len(buf), 0) + 64))
+                self._rmv = memoryview(buf)
+        try:
+            n = self._sock.readinto(self._rmv[self._rlen:])
+        except OSError as e:
+            if e.args[0] in BUSY_ERRORS:
+                return 0
+            raise
+        if n is None:
+            return 0
+        if n == 0:  # Connection closed by host
+            raise OSError(-1, "Connection closed by host")
+        self._rlen += n
+        self.last_rx = ticks_ms()
+        return n
+
+    # Partial packet buffered: wait for the rest. This runs under .lock, so the wait is
+    # bounded by response_time: a link that dies mid-packet raises OSError (and _handle_msg
+    # reconnects) instead of holding the lock and starving _keep_alive and every publisher.
+    async def _rx_more(self):
+        t = ticks_ms()
+        while not self._rx_fill():
+            if self._timeout(t) or not self.isconnected():
+                raise OSError(-1, "Timeout on socket read")
+            if self._rx_stream and self._isconnected:
+                await self._io_wait_ms(self._sock, self._response_time - ticks_diff(ticks_ms(), t))
+            else:
+                await asyncio.sleep_ms(0)
+
+    # Decode a Variable Byte Integer at buf[i:end]. Returns (value, next offset) or
+    # None if it is incomplete.
+    @staticmethod
+    def _rx_vbi(buf, i, end):
+        value = 0
+        shift = 0
+        while i < end:
+            b = buf[i]
+            i += 1
+            value |= (b & 0x7F) << shift
+            if not b & 0x80:
+                return value, i
+            shift += 7
+            if shift > 21:
+                raise OSError(-1, "Invalid remaining length")
+        return None
+
+    # Process every complete MQTT packet the socket has delivered.
     # Subscribed messages are delivered to a callback previously
     # set by .setup() method. Other (internal) MQTT
     # messages processed internally.
     # Immediate return if no data available. Called from ._handle_msg().
     async def wait_msg(self):
-        mqttv5 = self.mqttv5  # Cache local
-        try:
-            res = self._sock.read(1)  # Throws OSError on WiFi fail # Changed: No longer referring to Wi-Fi
-        except OSError as e:
-            if e.args[0] in BUSY_ERRORS:  # Needed by RP2
-                await asyncio.sleep_ms(0)
-                return
-            raise
-
-        if res is None:
+        if not self._rx_fill() and self._rpos == self._rlen:
             return
-        if res == b"":
-            raise OSError(-1, "Empty response")  # Can happen on broker fail
+        while self._rpos < self._rlen:
+            buf = self._rbuf
+            hdr = self._rx_vbi(buf, self._rpos + 1, self._rlen)
+            if hdr is not None:
+                sz, start = hdr
+                self._rneed = start + sz - self._rpos
+                if start + sz <= self._rlen:
+                    op = buf[self._rpos]
+                    self._rpos = start + sz
+                    self._rneed = 0
+                    await self._rx_packet(op, start, start + sz)
+                    continue
+            await self._rx_more()
+
+    async def _rx_packet(self, op, i, end):
+        mqttv5 = self.mqttv5  # Cache local
+        buf = self._rbuf
+        sz = end - i
 
-        if res == b"\xd0":  # PINGRESP
-            await self._as_read(1)  # Update .last_rx time
+        if op == 0xD0:  # PINGRESP (.last_rx already updated)
             return
-        op = res[0]
 
         if op == 0x40:  # PUBACK
-            sz, _ = await self._recv_len()
             if not mqttv5 and sz != 2:
                 raise OSError(-1, "Invalid PUBACK packet")
-            rcv_pid = await self._as_read(2)
-            pid = rcv_pid[0] << 8 | rcv_pid[1]
+            pid = buf[i] << 8 | buf[i + 1]
             # For some reason even on MQTTv5 reason code is optional
-            if sz != 2:
-                reason_code = await self._as_read(1)
-                reason_code = reason_code[0]
-                if reason_code >= 0x80:
-                    raise OSError(-1, "PUBACK reason code 0x%x" % reason_code)
-            if sz > 3:
-                puback_props_sz, _ = await self._recv_len()
-                if puback_props_sz > 0:
-                    puback_props = await self._as_read(puback_props_sz)
-                    decoded_props = decode_properties(puback_props, puback_props_sz)
-                    #self.dprint("PUBACK properties %s", decoded_props)
+            if sz > 2 and buf[i + 2] >= 0x80:
+                raise OSError(-1, "PUBACK reason code 0x%x" % buf[i + 2])
+            # PUBACK properties (sz > 3) are not used
             # No exception thrown: PUBACK successfuly received. Remove pending PID
             self.kill_pid(pid, "PUBACK")
+            return
 
         if op == 0x90 or op == 0xB0:  # [UN]SUBACK
             un = "UN" if op == 0xB0 else ""
             suback = op == 0x90
-            sz, _ = await self._recv_len()
-            rcv_pid = await self._as_read(2)
-            pid = rcv_pid[0] << 8 | rcv_pid[1]
-            sz -= 2
-            # Handle properties
-            if mqttv5:
-                suback_props_sz, sz_len = await self._recv_len()
-                sz -= sz_len
-                sz -= suback_props_sz
-                if suback_props_sz > 0:
-                    suback_props = await self._as_read(suback_props_sz)
-                    decoded_props = decode_properties(suback_props, suback_props_sz)
-                    #self.dprint("[UN] SUBACK properties %s", decoded_props)
-
-            if sz > 1:
+            pid = buf[i] << 8 | buf[i + 1]
+            i += 2
+            if mqttv5:  # Skip properties
+                props_sz, i = self._rx_vbi(buf, i, end)
+                i += props_sz
+            if end - i > 1:
                 raise OSError(-1, "Got too many bytes")
-            if suback or mqttv5:
-                reason_code = await self._as_read(sz)
-                reason_code = reason_code[0]
-                if reason_code >= 0x80:
-                    raise OSError(-1, f"{un}SUBACK reason code 0x{reason_code:x}")
+            if (suback or mqttv5) and i < end and buf[i] >= 0x80:
+                raise OSError(-1, f"{un}SUBACK reason code 0x{buf[i]:x}")
             self.kill_pid(pid, f"{un}SUBACK")
+            return
 
         if op == 0xE0:  # DISCONNECT
-            if mqttv5:
-                sz, _ = await self._recv_len()
-                reason_code = await self._as_read(1)
-                reason_code = reason_code[0]
-
-                sz -= 1
-                if sz > 0:
-                    dis_props_sz, dis_len = await self._recv_len()
-                    sz -= dis_len
-                    disconnect_props = await self._as_read(dis_props_sz)
-                    decoded_props = decode_properties(disconnect_props, dis_props_sz)
-                    #self.dprint("DISCONNECT properties %s", decoded_props)
-
-                if reason_code >= 0x80:
-                    raise OSError(-1, "DISCONNECT reason code 0x%x" % reason_code)
+            if mqttv5 and sz and buf[i] >= 0x80:
+                raise OSError(-1, "DISCONNECT reason code 0x%x" % buf[i])
+            return
 
         if op & 0xF0 != 0x30:
             return
 
-        sz, _ = await self._recv_len()
-        topic_len = await self._as_read(2)
-        topic_len = (topic_len[0] << 8) | topic_len[1]
-        topic = await self._as_read(topic_len)
-        topic = bytes(topic)  # Copy before re-using the read buffer
-        sz -= topic_len + 2
+        topic_len = buf[i] << 8 | buf[i + 1]
+        i += 2
+        topic = bytes(self._rmv[i:i + topic_len])  # Copy: the buffer is reused
+        i += topic_len
         # MQTT V3.1.1 section 2.3.1 non-normative comment. Get server PID.
         if op & 6:  # This is distinct from client PIDs.
-            pid = await self._as_read(2)
-            pid = pid[0] << 8 | pid[1]
-            sz -= 2
+            pid = buf[i] << 8 | buf[i + 1]
+            i += 2
 
         decoded_props = None
         if mqttv5:
-            pub_props_sz, pub_props_sz_len = await self._recv_len()
-            sz -= pub_props_sz_len
-            sz -= pub_props_sz
+            pub_props_sz, i = self._rx_vbi(buf, i, end)
             if pub_props_sz > 0:
-                pub_props = await self._as_read(pub_props_sz)
-                decoded_props = decode_properties(pub_props, pub_props_sz)
+                decoded_props = decode_properties(self._rmv[i:i + pub_props_sz], pub_props_sz)
+            i += pub_props_sz
 
-        msg = await self._as_read(sz)
+        msg = self._rmv[i:end]
         # In event mode we must copy the message otherwise .queue contents will be wrong:
         # every entry would contain the same message.
         # In callback mode not copying the message is OK so long as the callback is purely
@@ -686,7 +838,7 @@ class MQTT_base:
         self._cb(*args)
 
         if op & 6 == 2:  # qos 1
-            pkt = bytearray(b"\x40\x02\0\0")  # Send PUBACK
+            pkt = self._ackpkt  # Send PUBACK
             struct.pack_into("!H", pkt, 2, pid)
             await self._as_write(pkt)
         elif op & 6 == 4:  # qos 2 not supported
@@ -831,17 +983,24 @@ class MQTTClient(MQTT_base):
     # Launched by .connect(). Runs until connectivity fails. Checks for and
     # handles incoming messages.
     async def _handle_msg(self):
+        sock = self._sock  # A reconnect starts a new task for the new socket
         try:
-            while self.isconnected():
+            while self.isconnected() and self._sock is sock:
+                self.rx_wakeups += 1
+                if self._rx_stream:
+                    # Sleep, without the lock, until the broker sends something
+                    await self._io_wait(sock)
                 async with self.lock:
                     await self.wait_msg()  # Immediate return if no message
-                # https://github.com/peterhinch/micropython-mqtt/issues/166
-                # A delay > 0 is necessary for webrepl compatibility.
-                await asyncio.sleep_ms(5)  # Let other tasks get lock
+                if not self._rx_stream:
+                    # https://github.com/peterhinch/micropython-mqtt/issues/166
+                    # A delay > 0 is necessary for webrepl compatibility.
+                    await asyncio.sleep_ms(5)  # Let other tasks get lock
 
         except OSError:
             pass
-        self._reconnect()  # Broker fail. # Changed: Removed "or WiFi fail."
+        if self._sock is sock:  # Not if reconnect() already moved on to a new socket
+            self._reconnect()  # Broker fail. # Changed: Removed "or WiFi fail."
 
     # Keep broker alive MQTT spec 3.1.2.10 Keep Alive.
     # Runs until ping failure or no response in keepalive period.
@@ -885,6 +1044,7 @@ class MQTTClient(MQTT_base):
     def _reconnect(self):  # Schedule a reconnection if not underway.
         if self._isconnected:
             self._isconnected = False
+            self._wake_acks()
             asyncio.create_task(self._kill_tasks(True))  # Shut down tasks and socket
             if self._events:  # Signal an outage
                 self.down.set()
@@ -892,6 +1052,36 @@ class MQTTClient(MQTT_base):
                 # asyncio.create_task(self._wifi_handler(False))  # User handler. # REMOVED
                 pass # No wifi handler to call
 
+    # ADDED: Change connection settings at runtime (None = keep). max_inflight applies at
+    # once; the rest (the last will included, it is part of CONNECT) are used from the next
+    # connect on, and reconnect() applies them now.
+    def reconfigure(self, server=None, port=None, user=None, password=None, keepalive=None, will=None,
+                    max_inflight=None):
+        if server is not None:
+            self.server = server
+        if port is not None:
+            self.port = port
+        if server is not None or port is not None:
+            self._addr = socket.getaddrinfo(self.server, self.port)[0][-1]
+        if user is not None:
+            self._user = user
+        if password is not None:
+            self._pswd = password
+        if keepalive is not None:
+            if keepalive >= 65536:
+                raise ValueError("invalid keepalive time")
+            self._keepalive = keepalive
+            self._ping_interval = 1000 * keepalive // 4 if keepalive else 20000
+        if will is not None:
+            self._set_last_will(*will)
+        if max_inflight is not None:
+            self.max_inflight = max(max_inflight, 1)
+            self._set_window()
+
+    # ADDED: Drop the connection; _keep_connected reconnects with the current settings.
+    def reconnect(self):
+        self._reconnect()
+
     # Await broker connection.
     async def _connection(self):
         while not self._isconnected:
@@ -0,0 +1,77 @@
+# ack_bench.py Latency from sending a QoS 1 PUBLISH / SUBSCRIBE / UNSUBSCRIBE to its ACK.
+# Released under the MIT licence.
+
+# Start the broker stand-in on the host:  python3 stub_broker.py --port 1883
+# (add --ack-delay 5 to hold every PUBACK back by 5 ms, like a slower broker)
+# Then, from the directory holding the mqtt_as package, on the unix port:
+#   micropython -m mqtt_as.ack_bench [rounds] [event|poll]
+# Operations run one at a time so each figure is a single ACK round trip.
+# "poll" puts back the 100 ms rcv_pids loop SUBSCRIBE/UNSUBSCRIBE used to wait on, for
+# a before/after comparison. PUBACK already completed from its Event before that change.
+
+import sys
+import time
+import asyncio
+from mqtt_as import MQTTClient, config
+
+ROUNDS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+MODE = sys.argv[2] if len(sys.argv) > 2 else "event"
+TOPIC = "bench/ack"
+
+
+class Poll_Client(MQTTClient):
+    polling = False
+
+    async def _await_pid(self, pid, evt):
+        if not self.polling:
+            return await super()._await_pid(pid, evt)
+        # The SUBACK/UNSUBACK wait as it was: poll until kill_pid drops the pid
+        t = time.ticks_ms()
+        while pid in self.rcv_pids:
+            if self._timeout(t) or not self.isconnected():
+                return False
+            await asyncio.sleep_ms(100)
+        return True
+
+
+def report(name, lat):
+    lat.sort()
+    n = len(lat)
+    print("%-11s n=%d  min %dus  median %dus  p90 %dus  p99 %dus  max %dus"
+          % (name, n, lat[0], lat[n // 2], lat[n * 9 // 10], lat[min(n * 99 // 100, n - 1)], lat[-1]))
+
+
+async def timed(coro):
+    t = time.ticks_us()
+    await coro
+    return time.ticks_diff(time.ticks_us(), t)
+
+
+async def main():
+    cfg = dict(config)
+    cfg.update(server="127.0.0.1", port=1883)
+    client = Poll_Client(cfg)
+    await client.connect()
+    await asyncio.sleep(1)
+
+    pub = []
+    sub = []
+    unsub = []
+    for i in range(ROUNDS):
+        pub.append(await timed(client.publish(TOPIC, str(i), qos=1)))
+    client.polling = MODE == "poll"
+    for i in range(ROUNDS // 4 or 1):
+        sub.append(await timed(client.subscribe(TOPIC, 0)))
+        unsub.append(await timed(client.unsubscribe(TOPIC)))
+    await client.disconnect()
+
+    print("ACK wait: %s" % MODE)
+    report("PUBACK", pub)
+    report("SUBACK", sub)
+    report("UNSUBACK", unsub)
+
+
+try:
+    asyncio.run(main())
+finally:
+    asyncio.new_event_loop()
@@ -0,0 +1,70 @@
+# idle_bench.py Cost of an idle connection and inbound latency: rx_mode "poll" vs "stream".
+# Released under the MIT licence.
+
+# Start the broker stand-in on the host:  python3 stub_broker.py --port 1883
+# Then, from the directory holding the mqtt_as package, on the unix port:
+#   micropython -m mqtt_as.idle_bench [idle seconds]
+# CPU time comes from /proc/self/stat, so this needs Linux.
+
+import sys
+import time
+import asyncio
+from mqtt_as import MQTTClient, config
+
+IDLE_S = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+ECHOS = 20
+TOPIC = "bench/echo"
+
+
+def cpu_ticks():  # utime + stime of this process, in clock ticks (normally 1/100 s)
+    with open("/proc/self/stat") as f:
+        fields = f.read().split(")")[-1].split()
+    return int(fields[11]) + int(fields[12])
+
+
+async def run(mode):
+    got = asyncio.Event()
+    lat = []
+
+    def sub_cb(topic, msg, retained):
+        lat.append(time.ticks_diff(time.ticks_us(), int(msg)))
+        got.set()
+
+    async def conn_han(client):
+        await client.subscribe(TOPIC, 0)
+
+    cfg = dict(config)
+    cfg.update(server="127.0.0.1", port=1883, rx_mode=mode, subs_cb=sub_cb, connect_coro=conn_han)
+    client = MQTTClient(cfg)
+    await client.connect()
+    await asyncio.sleep(1)
+
+    wakeups = client.rx_wakeups
+    cpu = cpu_ticks()
+    t = time.ticks_ms()
+    await asyncio.sleep(IDLE_S)
+    secs = time.ticks_diff(time.ticks_ms(), t) / 1000
+    cpu = (cpu_ticks() - cpu) / 100
+    wakeups = client.rx_wakeups - wakeups
+
+    for _ in range(ECHOS):  # Round trip through the broker to our own subscription
+        got.clear()
+        await client.publish(TOPIC, str(time.ticks_us()), qos=0)
+        await asyncio.wait_for_ms(got.wait(), 2000)
+        await asyncio.sleep_ms(50)
+    await client.disconnect()
+
+    lat.sort()
+    print("%-6s idle %ds: CPU %.2fs (%.1f%%), %d rx wakeups (%.0f/s); echo median %dus max %dus"
+          % (mode, IDLE_S, cpu, 100 * cpu / secs, wakeups, wakeups / secs, lat[len(lat) // 2], lat[-1]))
+
+
+async def main():
+    for mode in ("poll", "stream"):
+        await run(mode)
+
+
+try:
+    asyncio.run(main())
+finally:
+    asyncio.new_event_loop()
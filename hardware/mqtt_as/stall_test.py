@@ -0,0 +1,57 @@
+# stall_test.py A broker link that dies half-way through a packet must be detected.
+# Released under the MIT licence.
+
+# Start the broker stand-in on the host:  python3 stub_broker.py --port 1883 --stall-topic test/stall
+# Then, from the directory holding the mqtt_as package, on the unix port:
+#   micropython -m mqtt_as.stall_test [poll|stream]
+# The client receives half of a PUBLISH and then nothing at all. The receive task must
+# give up within response_time, so the lock is freed and the client reconnects.
+
+import sys
+import time
+import asyncio
+from mqtt_as import MQTTClient, config
+
+MODE = sys.argv[1] if len(sys.argv) > 1 else "stream"
+TOPIC = "test/stall"
+RESPONSE_S = 3
+KEEPALIVE_S = 4
+
+connects = []
+
+
+async def conn_han(client):
+    connects.append(time.ticks_ms())
+    await client.subscribe(TOPIC, 0)
+
+
+async def main():
+    cfg = dict(config)
+    cfg.update(server="127.0.0.1", port=1883, rx_mode=MODE, connect_coro=conn_han,
+               response_time=RESPONSE_S, keepalive=KEEPALIVE_S)
+    client = MQTTClient(cfg)
+    await client.connect()
+    await asyncio.sleep(1)
+    assert len(connects) == 1, "no initial connection"
+
+    t = time.ticks_ms()
+    await client.publish(TOPIC, "x" * 200)
+    limit = (RESPONSE_S + KEEPALIVE_S) * 1000
+    while client.isconnected() and time.ticks_diff(time.ticks_ms(), t) < limit:
+        await asyncio.sleep_ms(50)
+    down = time.ticks_diff(time.ticks_ms(), t)
+    assert not client.isconnected(), "stalled link not detected in %dms" % limit
+    print("Link down after %dms" % down)
+
+    while len(connects) < 2 and time.ticks_diff(time.ticks_ms(), t) < limit + 10000:
+        await asyncio.sleep_ms(100)
+    assert len(connects) == 2, "did not reconnect"
+    await asyncio.wait_for_ms(client.publish("test/after", "ok", qos=1), RESPONSE_S * 1000)
+    print("Reconnected after %dms, publish ok (%s mode)" % (time.ticks_diff(connects[1], t), MODE))
+    await client.disconnect()
+
+
+try:
+    asyncio.run(main())
+finally:
+    asyncio.new_event_loop()
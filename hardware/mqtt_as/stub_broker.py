@@ -0,0 +1,162 @@
+# stub_broker.py Minimal local MQTT broker stand-in for the mqtt_as benchmarks.
+# Runs under CPython on the host:  python3 stub_broker.py [--port 1883] [--ack-delay 0]
+# Released under the MIT licence.
+
+# Handles just enough of MQTT 3.1.1 (and the V5 framing mqtt_as uses) for
+# benchmarking: CONNECT, PUBLISH QoS 0/1 with routing to subscribers (+/# filters),
+# SUBSCRIBE, UNSUBSCRIBE, PINGREQ, DISCONNECT. No sessions, retained messages or QoS 2.
+# --ack-delay holds every PUBACK back to simulate a slower link or broker.
+# --stall-topic: a message published there reaches its subscribers cut in half, after
+# which the broker ignores them (no PINGRESP either), like a link dying mid-packet.
+
+import argparse
+import asyncio
+import struct
+
+
+def vbi(x):
+    out = bytearray()
+    while True:
+        b = x & 0x7F
+        x >>= 7
+        out.append(b | 0x80 if x else b)
+        if not x:
+            return bytes(out)
+
+
+def matches(filt, topic):
+    f = filt.split("/")
+    t = topic.split("/")
+    for i, part in enumerate(f):
+        if part == "#":
+            return True
+        if i >= len(t) or (part != "+" and part != t[i]):
+            return False
+    return len(f) == len(t)
+
+
+class Client:
+    def __init__(self, writer):
+        self.writer = writer
+        self.subs = set()
+        self.v5 = False
+        self.silent = False
+
+    def send(self, op, body=b"", cut=False):
+        if self.silent:
+            return
+        pkt = bytes([op]) + vbi(len(body)) + body
+        if cut:
+            pkt = pkt[:len(pkt) // 2]
+            self.silent = True
+        self.writer.write(pkt)
+
+
+class Broker:
+    def __init__(self, ack_delay, receive_max, stall_topic=None):
+        self.ack_delay = ack_delay
+        self.receive_max = receive_max
+        self.stall_topic = stall_topic
+        self.clients = set()
+        self.stats = dict(connects=0, publish=0, puback=0)
+
+    async def read_packet(self, reader):
+        op = (await reader.readexactly(1))[0]
+        size = shift = 0
+        while True:
+            b = (await reader.readexactly(1))[0]
+            size |= (b & 0x7F) << shift
+            shift += 7
+            if not b & 0x80:
+                break
+        return op, await reader.readexactly(size)
+
+    def route(self, topic, payload, sender):
+        for c in self.clients:
+            if any(matches(f, topic) for f in c.subs):
+                t = topic.encode()
+                props = b"\x00" if c.v5 else b""
+                c.send(0x30, struct.pack("!H", len(t)) + t + props + payload, cut=topic == self.stall_topic)
+
+    async def puback(self, c, pid):
+        if self.ack_delay:
+            await asyncio.sleep(self.ack_delay)
+        c.send(0x40, pid)
+        self.stats["puback"] += 1
+        await c.writer.drain()
+
+    async def handle(self, reader, writer):
+        c = Client(writer)
+        try:
+            while True:
+                op, body = await self.read_packet(reader)
+                kind = op & 0xF0
+                if kind == 0x10:  # CONNECT
+                    c.v5 = body[6] == 5
+                    self.clients.add(c)
+                    self.stats["connects"] += 1
+                    if c.v5:
+                        props = b"\x21" + struct.pack("!H", self.receive_max) if self.receive_max else b""
+                        c.send(0x20, b"\x00\x00" + vbi(len(props)) + props)
+                    else:
+                        c.send(0x20, b"\x00\x00")
+                elif kind == 0x30:  # PUBLISH
+                    self.stats["publish"] += 1
+                    tl = struct.unpack_from("!H", body)[0]
+                    topic = body[2:2 + tl].decode()
+                    offs = 2 + tl
+                    pid = None
+                    if op & 0x06:
+                        pid = body[offs:offs + 2]
+                        offs += 2
+                    if c.v5:
+                        offs += 1 + body[offs]  # Properties (short form only)
+                    self.route(topic, body[offs:], c)
+                    if pid is not None:
+                        asyncio.ensure_future(self.puback(c, pid))
+                elif kind == 0x80:  # SUBSCRIBE
+                    offs = 2 + (1 + body[2] if c.v5 else 0)
+                    codes = b""
+                    while offs < len(body):
+                        tl = struct.unpack_from("!H", body, offs)[0]
+                        c.subs.add(body[offs + 2:offs + 2 + tl].decode())
+                        codes += bytes([body[offs + 2 + tl] & 0x03])
+                        offs += 3 + tl
+                    c.send(0x90, body[:2] + (b"\x00" if c.v5 else b"") + codes)
+                elif kind == 0xA0:  # UNSUBSCRIBE
+                    offs = 2 + (1 + body[2] if c.v5 else 0)
+                    tl = struct.unpack_from("!H", body, offs)[0]
+                    c.subs.discard(body[offs + 2:offs + 2 + tl].decode())
+                    c.send(0xB0, body[:2] + (b"\x00\x00" if c.v5 else b""))
+                elif kind == 0xC0:  # PINGREQ
+                    c.send(0xD0)
+                elif kind == 0xE0:  # DISCONNECT
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.discard(c)
+            writer.close()
+
+
+async def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=1883)
+    ap.add_argument("--ack-delay", type=float, default=0, help="PUBACK delay in ms")
+    ap.add_argument("--receive-max", type=int, default=0, help="V5 Receive Maximum to advertise")
+    ap.add_argument("--stall-topic", help="Send messages on this topic half-way, then go silent")
+    args = ap.parse_args()
+    broker = Broker(args.ack_delay / 1000, args.receive_max, args.stall_topic)
+    server = await asyncio.start_server(broker.handle, args.host, args.port)
+    print("Stub broker on %s:%d (PUBACK delay %gms)" % (args.host, args.port, args.ack_delay))
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass